@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Szavazat-commit áteresztőképesség mérése adatbázis profilonként
+
+Minden profilhoz friss, ideiglenes SQLite fájlt hoz létre, majd párhuzamos
+szálakon szavazatokat ír a szavazat puffer író szálával azonos upsert-tel
+(INSERT ... ON CONFLICT DO UPDATE a játékos és kör egyedi indexén, commit),
+miközben olvasó szálak a játékállapot lekérdezését szimulálják.
+
+Használat: python bench_db.py [--writers 32] [--readers 8] [--seconds 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from flask import Flask
+from sqlalchemy import or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.models.user import db
+from src.models.game import Game, Team, Player, Round, Vote
+from src.services.db_profile import PROFILES, configure_db_profile, init_db_profile
+
+def create_app(db_path, profile_name):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    configure_db_profile(app, profile_name)
+    db.init_app(app)
+    init_db_profile(app, db)
+    return app
+
+def seed(app, player_count):
+    """Egy játék, egy szavazási kör és párokba rendezett játékosok"""
+    with app.app_context():
+        db.create_all()
+        game = Game(name="Benchmark", state="playing", current_round=1)
+        db.session.add(game)
+        db.session.flush()
+
+        player_ids = []
+        for index in range(0, player_count, 2):
+            team = Team(name=f"Csapat {index // 2}", game_id=game.id)
+            db.session.add(team)
+            db.session.flush()
+            for offset in range(2):
+                player = Player(
+                    name=f"Vendég {index + offset}",
+                    nickname="Bench",
+                    session_id=f"bench-{index + offset}",
+                    team_id=team.id
+                )
+                db.session.add(player)
+                db.session.flush()
+                player_ids.append((player.id, team.id))
+
+        voting_round = Round(game_id=game.id, round_number=1, state="voting")
+        db.session.add(voting_round)
+        db.session.commit()
+        return game.id, voting_round.id, player_ids
+
+def vote_upsert():
+    """Ugyanaz az upsert, mint a szavazat puffer kötegeiben (uq_vote_player_round)"""
+    table = Vote.__table__
+    statement = sqlite_insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.player_id, table.c.round_id],
+        set_={
+            'number': statement.excluded.number,
+            'team_id': statement.excluded.team_id,
+            'updated_at': statement.excluded.updated_at
+        },
+        where=or_(table.c.updated_at.is_(None), table.c.updated_at <= statement.excluded.updated_at)
+    )
+
+def writer(app, round_id, players, deadline, stats):
+    statement = vote_upsert()
+    with app.app_context():
+        while time.perf_counter() < deadline:
+            player_id, team_id = random.choice(players)
+            started = time.perf_counter()
+            try:
+                voted_at = datetime.utcnow()
+                db.session.execute(statement, {
+                    'player_id': player_id,
+                    'team_id': team_id,
+                    'round_id': round_id,
+                    'number': random.randint(1, 20),
+                    'created_at': voted_at,
+                    'updated_at': voted_at
+                })
+                db.session.commit()
+                stats['latencies'].append(time.perf_counter() - started)
+            except Exception as e:
+                db.session.rollback()
+                stats['errors'].append(str(e).splitlines()[0])
+            finally:
+                db.session.remove()
+
+def reader(app, game_id, deadline, stats):
+    with app.app_context():
+        while time.perf_counter() < deadline:
+            try:
+                Game.query.filter_by(id=game_id).first().to_dict()
+                stats['reads'] += 1
+            except Exception as e:
+                stats['errors'].append(str(e).splitlines()[0])
+            finally:
+                db.session.remove()
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def run_profile(profile_name, args):
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(os.path.join(directory, 'bench.db'), profile_name)
+        game_id, round_id, players = seed(app, args.players)
+
+        stats = {'latencies': [], 'errors': [], 'reads': 0}
+        deadline = time.perf_counter() + args.seconds
+        threads = [threading.Thread(target=writer, args=(app, round_id, players, deadline, stats))
+                   for _ in range(args.writers)]
+        threads += [threading.Thread(target=reader, args=(app, game_id, deadline, stats))
+                    for _ in range(args.readers)]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with app.app_context():
+            db.engine.dispose()
+
+    commits = len(stats['latencies'])
+    return {
+        'profile': profile_name,
+        'commits_per_second': commits / args.seconds,
+        'reads_per_second': stats['reads'] / args.seconds,
+        'p50_ms': percentile(stats['latencies'], 0.50) * 1000,
+        'p99_ms': percentile(stats['latencies'], 0.99) * 1000,
+        'errors': len(stats['errors']),
+        'first_error': stats['errors'][0] if stats['errors'] else ''
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Szavazat-commit benchmark adatbázis profilonként')
+    parser.add_argument('--profiles', nargs='+', default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument('--writers', type=int, default=32, help='Párhuzamos szavazó szálak')
+    parser.add_argument('--readers', type=int, default=8, help='Párhuzamos állapot-lekérdező szálak')
+    parser.add_argument('--players', type=int, default=200, help='Vendégek száma')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Mérés időtartama profilonként')
+    args = parser.parse_args()
+
+    print(f"{'profil':<12}{'commit/s':>10}{'olvasás/s':>11}{'p50 ms':>9}{'p99 ms':>9}{'hiba':>7}")
+    for profile_name in args.profiles:
+        result = run_profile(profile_name, args)
+        print(f"{result['profile']:<12}{result['commits_per_second']:>10.1f}{result['reads_per_second']:>11.1f}"
+              f"{result['p50_ms']:>9.1f}{result['p99_ms']:>9.1f}{result['errors']:>7}")
+        if result['first_error']:
+            print(f"  első hiba: {result['first_error']}")
+
+if __name__ == "__main__":
+    main()
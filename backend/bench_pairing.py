@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Párosítás benchmark: kézi /pair hívások és az automatikus beosztás összevetése
+
+Vendégszámonként friss, ideiglenes SQLite fájlba importál vendégeket, majd
+egyszer egyenként párosítja őket a /pair végponton (ahogy a kliensek),
+egyszer pedig egyetlen /moderator/auto-pair hívással. Méri a teljes időt és
+a kiadott SQL utasítások számát; az automatikus beosztás megkötésekkel
+(keep_apart párok) is lefut.
+
+Használat: python bench_pairing.py [--players 100 500 2000] [--team-size 2]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from flask import Flask
+from sqlalchemy import event
+from src.models.user import db
+from src.models.game import Player
+from src.routes.game import game_bp
+from src.services.active_game import active_games, init_active_game
+from src.services.db_profile import configure_db_profile, init_db_profile
+from src.services.guest_import import import_guests
+from src.services.name_allocator import init_name_allocator, name_allocator
+from src.services.settings_cache import init_settings_cache
+from src.services.state_cache import init_state_cache
+from src.services.team_counts import init_team_counts
+
+def create_app(db_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    configure_db_profile(app)
+    db.init_app(app)
+    init_db_profile(app, db)
+    init_state_cache(app, db)
+    init_active_game(app, db)
+    init_settings_cache(app, db)
+    init_name_allocator(app, db)
+    init_team_counts(app, db)
+    app.register_blueprint(game_bp, url_prefix='/api')
+
+    with app.app_context():
+        from src.models.game import Team, Game, Round, Vote, QuizQuestion
+        from src.models.supporter import SupporterToken, ModeratorAction
+        from src.models.game_settings import GameSettings
+        db.create_all()
+
+    app.statement_count = 0
+
+    with app.app_context():
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            app.statement_count += 1
+    return app
+
+def seed(app, player_count):
+    """Friss játék párosítatlan vendégekkel, párválasztás fázisban"""
+    active_games.invalidate()
+    name_allocator.reset()
+    with app.app_context():
+        import_guests((f'Vendég {index}' for index in range(player_count)), skip_existing=False)
+        player_ids = [player_id for player_id, in db.session.query(Player.id).order_by(Player.id)]
+    client = app.test_client()
+    client.post('/api/game/start-pairing')
+    return client, player_ids
+
+def run_manual(player_count):
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(os.path.join(directory, 'bench.db'))
+        client, player_ids = seed(app, player_count)
+        random.shuffle(player_ids)
+
+        app.statement_count = 0
+        started = time.perf_counter()
+        for first, second in zip(player_ids[0::2], player_ids[1::2]):
+            response = client.post('/api/pair', json={'player1_id': first, 'player2_id': second})
+            assert response.status_code == 201, response.get_json()
+        elapsed = time.perf_counter() - started
+        statements = app.statement_count
+
+        with app.app_context():
+            db.engine.dispose()
+    return elapsed, statements
+
+def run_auto(player_count, team_size, constrained):
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(os.path.join(directory, 'bench.db'))
+        client, player_ids = seed(app, player_count)
+
+        payload = {'team_size': team_size, 'seed': 1}
+        if constrained:
+            # Vendégek ~5%-a párban együtt, ~10%-a valakitől távol tartva
+            rng = random.Random(1)
+            sample = rng.sample(player_ids, max(2, player_count // 10))
+            payload['keep_together'] = [sample[index:index + 2] for index in range(0, len(sample) // 2, 2)]
+            payload['keep_apart'] = [[player_id, rng.choice(player_ids)] for player_id in sample[len(sample) // 2:]]
+            payload['keep_apart'] = [pair for pair in payload['keep_apart'] if pair[0] != pair[1]]
+
+        app.statement_count = 0
+        started = time.perf_counter()
+        response = client.post('/api/moderator/auto-pair', json=payload)
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 201, response.get_json()
+        statements = app.statement_count
+
+        with app.app_context():
+            db.engine.dispose()
+    return elapsed, statements
+
+def main():
+    parser = argparse.ArgumentParser(description='Kézi és automatikus párosítás benchmark')
+    parser.add_argument('--players', type=int, nargs='+', default=[100, 500, 2000])
+    parser.add_argument('--team-size', type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"{'vendég':>8}{'kézi ms':>10}{'kézi SQL':>10}{'auto ms':>10}{'auto SQL':>10}{'megkötéssel ms':>16}")
+    for player_count in args.players:
+        manual_time, manual_statements = run_manual(player_count)
+        auto_time, auto_statements = run_auto(player_count, args.team_size, constrained=False)
+        constrained_time, _ = run_auto(player_count, args.team_size, constrained=True)
+        print(f"{player_count:>8}{manual_time * 1000:>10.0f}{manual_statements:>10}"
+              f"{auto_time * 1000:>10.0f}{auto_statements:>10}{constrained_time * 1000:>16.0f}")
+
+if __name__ == "__main__":
+    main()
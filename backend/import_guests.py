@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Vendéglista előregisztrálása a játék előtt (CSV vagy JSON)
+
+A vendégek becenevet és belépő tokent kapnak; a tokenekből (és a
+--base-url alapján összeállított QR tartalomból) fájl készíthető, amelyet
+ki lehet nyomtatni. A futó szerver a közös jelzőfájlokon keresztül
+azonnal látja az új játékosokat.
+
+Használat: python import_guests.py vendegek.csv [--tokens-out tokenek.csv]
+           [--base-url https://eskuvo.example] [--batch-size 500] [--allow-duplicates]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from flask import Flask
+from src.models.user import db
+from src.services.active_game import init_active_game
+from src.services.db_profile import configure_db_profile, init_db_profile
+from src.services.guest_import import BATCH_SIZE, import_guests, read_guest_names, render_guest_tokens
+from src.services.name_allocator import init_name_allocator
+from src.services.state_cache import init_state_cache
+from src.services.team_counts import init_team_counts
+
+DEFAULT_DATABASE = os.path.join(os.path.dirname(__file__), 'src', 'database', 'app.db')
+
+def create_app(db_path):
+    """Csak adatbázis és gyorsítótár jelzők (a szerver háttérszálai nélkül)"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    configure_db_profile(app)
+    db.init_app(app)
+    init_db_profile(app, db)
+    init_state_cache(app, db)
+    init_active_game(app, db)
+    init_name_allocator(app, db)
+    init_team_counts(app, db)
+
+    with app.app_context():
+        from src.models.game import Player, Team, Game, Round, Vote, QuizQuestion
+        from src.models.supporter import SupporterToken, ModeratorAction
+        from src.models.game_settings import GameSettings
+        from src.models.migration import upgrade_schema
+        db.create_all()
+        upgrade_schema()
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description='Vendéglista előregisztrálása')
+    parser.add_argument('guest_list', help='CSV (name/név oszlop vagy első oszlop) vagy JSON fájl')
+    parser.add_argument('--format', choices=['csv', 'json'], help='alapértelmezés: kiterjesztés alapján')
+    parser.add_argument('--database', default=DEFAULT_DATABASE)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--allow-duplicates', action='store_true',
+                        help='a már regisztrált nevek is új játékost kapnak')
+    parser.add_argument('--tokens-out', help='belépő tokenek fájlja (.csv vagy .json)')
+    parser.add_argument('--base-url', help='QR tartalom: <base-url>/?join=<token>')
+    args = parser.parse_args()
+    if args.batch_size < 1:
+        parser.error('a --batch-size legalább 1 legyen')
+
+    app = create_app(args.database)
+    with app.app_context(), open(args.guest_list, encoding='utf-8-sig', newline='') as stream:
+        names = read_guest_names(stream, args.format, args.guest_list)
+        result = import_guests(names, batch_size=args.batch_size, skip_existing=not args.allow_duplicates)
+
+    print(f'{len(result.guests)} vendég előregisztrálva {result.batches} kötegben '
+          f'({result.elapsed_ms} ms), kihagyva: {result.skipped_existing} már regisztrált, '
+          f'{result.skipped_invalid} érvénytelen sor')
+
+    if args.tokens_out:
+        fmt = 'json' if args.tokens_out.lower().endswith('.json') else 'csv'
+        with open(args.tokens_out, 'w', encoding='utf-8', newline='') as output:
+            output.write(render_guest_tokens(result.guests, fmt, args.base_url))
+        print(f'Belépő tokenek: {args.tokens_out}')
+
+if __name__ == '__main__':
+    main()
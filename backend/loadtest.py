@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Esküvői terheléses teszt - több száz virtuális vendég a valódi HTTP API ellen
+
+A vendégek asyncio korutinok: regisztrálnak, párba állnak, 3 másodpercenként
+lekérdezik a játék állapotát (ETag-gel), szavaznak - jellemzően az utolsó
+2 másodpercben -, a kiesettek szurkolói végpontokat hívnak, a moderátor pedig
+lezárja a köröket, jóváhagyja a kvízt és rablást indít.
+
+Csak helyi/teszt szerver ellen futtasd: a script újraindítja a játékot!
+
+Használat: python loadtest.py [--base-url http://127.0.0.1:5000] [--guests 250] [--rounds 3]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+MODERATOR_CODE = 'MODERATOR2025'
+
+class Stats:
+    """Végpontonkénti késleltetések és hibák"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.rejected = defaultdict(int)  # 4xx válaszok (pl. lejárt szavazási idő)
+        self.errors = defaultdict(int)  # 5xx válaszok és kapcsolati hibák
+        self.started = time.perf_counter()
+
+    def record(self, label, status, elapsed):
+        self.latencies[label].append(elapsed)
+        if status is None or status >= 500:
+            self.errors[label] += 1
+        elif status >= 400:
+            self.rejected[label] += 1
+
+    def report(self):
+        duration = time.perf_counter() - self.started
+        print(f"\n{'végpont':<34}{'db':>7}{'4xx':>6}{'hiba':>6}{'hiba%':>7}"
+              f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'kérés/s':>9}")
+
+        total = total_errors = 0
+        for label in sorted(self.latencies):
+            values = sorted(self.latencies[label])
+            count = len(values)
+            total += count
+            total_errors += self.errors[label]
+            print(f"{label:<34}{count:>7}{self.rejected[label]:>6}{self.errors[label]:>6}"
+                  f"{100 * self.errors[label] / count:>6.1f}%"
+                  f"{percentile(values, 0.50):>9.1f}{percentile(values, 0.95):>9.1f}"
+                  f"{percentile(values, 0.99):>9.1f}{count / duration:>9.1f}")
+
+        print(f"\nÖsszesen {total} kérés {duration:.1f} mp alatt ({total / duration:.1f} kérés/s), "
+              f"hibaarány: {100 * total_errors / max(total, 1):.2f}%")
+
+def percentile(ordered_values, fraction):
+    if not ordered_values:
+        return 0.0
+    index = min(len(ordered_values) - 1, int(len(ordered_values) * fraction))
+    return ordered_values[index] * 1000
+
+class HttpClient:
+    """Minimális asyncio HTTP/1.1 kliens (keep-alive, ha a szerver engedi)"""
+
+    def __init__(self, base_url, stats, timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.stats = stats
+        self.timeout = timeout
+        self._reader = None
+        self._writer = None
+
+    async def request(self, method, path, body=None, headers=None, label=None):
+        """Kérés küldése; (státusz, fejlécek, JSON vagy None) a visszatérési érték"""
+        label = label or f'{method} {path}'
+        started = time.perf_counter()
+        try:
+            status, response_headers, data = await asyncio.wait_for(
+                self._send(method, path, body, headers or {}), self.timeout
+            )
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            self.close()
+            self.stats.record(label, None, time.perf_counter() - started)
+            return None, {}, None
+
+        self.stats.record(label, status, time.perf_counter() - started)
+        try:
+            payload = json.loads(data) if data else None
+        except ValueError:
+            payload = None
+        return status, response_headers, payload
+
+    async def _send(self, method, path, body, headers):
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        lines = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            'Connection: keep-alive',
+            f'Content-Length: {len(payload)}'
+        ]
+        if body is not None:
+            lines.append('Content-Type: application/json')
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        message = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload
+
+        # Egy újrapróbálás, ha a szerver közben bezárta a keep-alive kapcsolatot
+        for attempt in range(2):
+            if self._writer is None:
+                self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            self._writer.write(message)
+            await self._writer.drain()
+            status_line = await self._reader.readline()
+            if status_line:
+                break
+            self.close()
+            if attempt:
+                raise ConnectionResetError('A szerver bontotta a kapcsolatot')
+
+        version, status = status_line.decode('latin-1').split(' ', 2)[:2]
+        response_headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if 'content-length' in response_headers:
+            data = await self._reader.readexactly(int(response_headers['content-length']))
+        elif response_headers.get('transfer-encoding') == 'chunked':
+            data = await self._read_chunked()
+        elif int(status) in (204, 304):
+            data = b''
+        else:
+            data = await self._reader.read()
+            response_headers['connection'] = 'close'
+
+        if version == 'HTTP/1.0' or response_headers.get('connection', '').lower() == 'close':
+            self.close()
+        return int(status), response_headers, data
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self._reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await self._reader.readline()
+                return b''.join(chunks)
+            chunks.append(await self._reader.readexactly(size))
+            await self._reader.readline()
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+class Guest:
+    """Egy virtuális vendég; az állapot-lekérdezés külön kapcsolaton fut, mint a böngészőben"""
+
+    def __init__(self, index, base_url, stats):
+        self.index = index
+        self.client = HttpClient(base_url, stats)
+        self.poller = HttpClient(base_url, stats)
+        self.player_id = None
+        self.team_id = None
+        self.is_active = True
+        self.etag = None
+        self.number_max = 20
+
+    async def register(self, ramp_seconds):
+        await asyncio.sleep(random.uniform(0, ramp_seconds))
+        status, _, data = await self.client.request(
+            'POST', '/api/register', {'name': f'Vendég {self.index}'}
+        )
+        if status == 201:
+            self.player_id = data['player']['id']
+
+    async def poll_state(self, stop_event, interval, known_teams):
+        """3 másodperces állapot-lekérdezés, mint a valódi kliens"""
+        await asyncio.sleep(random.uniform(0, interval))
+        while not stop_event.is_set():
+            headers = {'If-None-Match': self.etag} if self.etag else {}
+            status, response_headers, data = await self.poller.request(
+                'GET', '/api/game/state', headers=headers
+            )
+            if status == 200 and data and data.get('game'):
+                self.etag = response_headers.get('etag')
+                known_teams.update({team['id']: team for team in data['game']['teams']})
+            try:
+                await asyncio.wait_for(stop_event.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def vote_round(self, voting_seconds, burst_seconds):
+        """Néhány korai tipp, majd a végleges szám az utolsó másodpercekben"""
+        early_votes = random.randint(0, 2)
+        vote_times = sorted(random.uniform(0, max(0.1, voting_seconds - burst_seconds))
+                            for _ in range(early_votes))
+        vote_times.append(random.uniform(voting_seconds - burst_seconds, voting_seconds - 0.2))
+
+        started = time.perf_counter()
+        for at in vote_times:
+            await asyncio.sleep(max(0, at - (time.perf_counter() - started)))
+            await self.client.request('POST', '/api/vote/submit', {
+                'player_id': self.player_id,
+                'number': random.randint(1, self.number_max)
+            })
+
+    async def support_round(self, team_ids):
+        """Kiesett vendég: tokenek lekérdezése és tipp leadása"""
+        await asyncio.sleep(random.uniform(0, 3))
+        await self.client.request('GET', '/api/supporter/tokens')
+        if team_ids:
+            await self.client.request('POST', '/api/supporter/predict', {
+                'player_id': self.player_id,
+                'predicted_number': random.randint(1, self.number_max),
+                'predicted_team_id': random.choice(team_ids)
+            })
+
+async def run(args):
+    stats = Stats()
+    moderator = HttpClient(args.base_url, stats)
+
+    print(f"Játék újraindítása és {args.guests} vendég regisztrálása...")
+    await moderator.request('POST', '/api/moderator/reset-game')
+
+    guests = [Guest(index, args.base_url, stats) for index in range(args.guests)]
+    await asyncio.gather(*(guest.register(args.ramp_seconds) for guest in guests))
+    guests = [guest for guest in guests if guest.player_id]
+    if len(guests) < 2:
+        print("Túl kevés sikeres regisztráció, a teszt leáll.")
+        return stats
+
+    await moderator.request('POST', '/api/settings/update', {
+        'secret_code': MODERATOR_CODE,
+        'voting_duration_seconds': args.voting_seconds
+    })
+    status, _, data = await moderator.request('GET', '/api/settings/get')
+    number_max = data['settings']['number_range_max'] if status == 200 else 20
+    voting_seconds = data['settings']['effective_voting_duration'] if status == 200 else args.voting_seconds
+
+    # Párosítás: a vendégek egyszerre kérik a párjukat
+    print("Párosítás...")
+    await moderator.request('POST', '/api/game/start-pairing')
+    random.shuffle(guests)
+    pairs = list(zip(guests[0::2], guests[1::2]))
+
+    async def pair(first, second):
+        status, _, data = await first.client.request('POST', '/api/pair', {
+            'player1_id': first.player_id,
+            'player2_id': second.player_id
+        })
+        if status == 201:
+            first.team_id = second.team_id = data['team']['id']
+
+    await asyncio.gather(*(pair(first, second) for first, second in pairs))
+    for guest in guests:
+        guest.number_max = number_max
+        guest.is_active = guest.team_id is not None
+
+    known_teams = {}
+    stop_polling = asyncio.Event()
+    pollers = [asyncio.create_task(guest.poll_state(stop_polling, args.poll_seconds, known_teams))
+               for guest in guests]
+
+    await moderator.request('POST', '/api/game/start-playing')
+
+    for round_number in range(1, args.rounds + 1):
+        if round_number > 1:
+            await moderator.request('POST', '/api/moderator/start-round')
+        print(f"{round_number}. kör: {voting_seconds} mp szavazás...")
+
+        # A csapattagság a legutóbbi állapot-lekérdezésből
+        active_players = {member['id'] for team in known_teams.values() for member in team['members']}
+        for guest in guests:
+            if known_teams:
+                guest.is_active = guest.player_id in active_players
+        team_ids = list(known_teams)
+
+        await asyncio.gather(*(
+            guest.vote_round(voting_seconds, args.burst_seconds) if guest.is_active
+            else guest.support_round(team_ids)
+            for guest in guests
+        ))
+        await asyncio.sleep(0.4)  # türelmi idő a szerver oldalon
+
+        status, _, result = await moderator.request('POST', '/api/vote/finalize')
+        if status != 200 or not result or result.get('is_tie'):
+            continue
+
+        winner_team_id = result['winner_team_id']
+        await moderator.request('POST', '/api/supporter/evaluate', {
+            'winning_team_id': winner_team_id,
+            'winning_number': result['winning_number']
+        })
+        await moderator.request('POST', '/api/quiz/answer', {
+            'team_id': winner_team_id,
+            'answer': 'Terheléses teszt',
+            'is_correct': True
+        })
+
+        victims = [member['id'] for team_id, team in known_teams.items() if team_id != winner_team_id
+                   for member in team['members']]
+        if victims:
+            await moderator.request('POST', '/api/steal-player', {
+                'stealing_team_id': winner_team_id,
+                'target_player_id': random.choice(victims)
+            })
+
+    stop_polling.set()
+    await asyncio.gather(*pollers)
+    for guest in guests:
+        guest.client.close()
+        guest.poller.close()
+    moderator.close()
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description='Esküvői terheléses teszt virtuális vendégekkel')
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--guests', type=int, default=250, help='Virtuális vendégek száma')
+    parser.add_argument('--rounds', type=int, default=3, help='Lejátszott körök száma')
+    parser.add_argument('--voting-seconds', type=int, default=10, help='Szavazási idő (10-60 mp)')
+    parser.add_argument('--burst-seconds', type=float, default=2.0, help='Az utolsó hullám hossza')
+    parser.add_argument('--poll-seconds', type=float, default=3.0, help='Állapot-lekérdezés gyakorisága')
+    parser.add_argument('--ramp-seconds', type=float, default=5.0, help='Regisztrációk szétterítése')
+    args = parser.parse_args()
+
+    stats = asyncio.run(run(args))
+    stats.report()
+
+if __name__ == "__main__":
+    main()
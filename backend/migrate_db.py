@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Adatbázis séma frissítő script meglévő app.db fájlokhoz
+
+Használat: python migrate_db.py [adatbázis_fájl]
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from flask import Flask
+from src.models.user import db
+from src.models.game import Player, Team, Game, Round, Vote, QuizQuestion
+from src.models.supporter import SupporterToken, ModeratorAction
+from src.models.game_settings import GameSettings
+from src.models.migration import upgrade_schema
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), 'src', 'database', 'app.db')
+
+def migrate(db_path):
+    """Hiányzó táblák, oszlopok és indexek létrehozása"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    db.init_app(app)
+
+    with app.app_context():
+        db.create_all()
+        added_columns, created_indexes = upgrade_schema()
+
+    if not added_columns and not created_indexes:
+        print("Az adatbázis séma már naprakész.")
+        return
+
+    for column in added_columns:
+        print(f"Oszlop hozzáadva: {column}")
+    for index in created_indexes:
+        print(f"Index létrehozva: {index}")
+
+if __name__ == "__main__":
+    migrate(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DB_PATH)
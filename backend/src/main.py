@@ -11,6 +11,17 @@ from src.routes.game import game_bp
 from src.routes.supporter import supporter_bp
 from src.routes.voting import voting_bp
 from src.routes.settings import settings_bp
+from src.services.active_game import init_active_game
+from src.services.db_profile import configure_db_profile, init_db_profile
+from src.services.metrics import init_metrics
+from src.services.name_allocator import init_name_allocator
+from src.services.request_profiler import init_request_profiler
+from src.services.round_timer import init_round_timer
+from src.services.settings_cache import init_settings_cache
+from src.services.state_cache import init_state_cache
+from src.services.team_counts import init_team_counts
+from src.services.vote_buffer import init_vote_buffer
+from src.services.vote_journal import init_vote_journal
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -29,14 +40,49 @@ app.register_blueprint(settings_bp, url_prefix='/api')
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# SQLite hangolás (DB_PROFILE=production|default, alapértelmezés: production)
+configure_db_profile(app)
+
 db.init_app(app)
+init_db_profile(app, db)
+
+# Kérésenkénti SQL és időmérés Server-Timing fejlécben (REQUEST_PROFILING=1)
+init_request_profiler(app, db)
+
+# Prometheus metrikák (/api/metrics)
+init_metrics(app, db)
+
+# Állapotverziók követése (gyorsítótár, ETag és stream értesítések)
+init_state_cache(app, db)
+
+# Aktív játék gyorsítótár (több worker esetén közös jelzőfájllal)
+init_active_game(app, db)
+init_settings_cache(app, db)
+
+# Becenév és csapatnév készletek (inaktiváláskor a név visszakerül)
+init_name_allocator(app, db)
+
+# Csapatok aktív tagszáma (Team.member_count) a játékos módosításával együtt íródik
+init_team_counts(app, db)
+
+# Szavazatok write-behind pufferelése egyetlen író szállal
+init_vote_buffer(app, db)
 
 with app.app_context():
     # Importáljuk a modelleket az adatbázis létrehozásához
     from src.models.game import Player, Team, Game, Round, Vote, QuizQuestion
     from src.models.supporter import SupporterToken, ModeratorAction
     from src.models.game_settings import GameSettings
+    from src.models.migration import upgrade_schema
     db.create_all()
+    # Régebbi app.db fájlok: hiányzó oszlopok és indexek pótlása
+    upgrade_schema()
+
+# Összeomlás előtt elfogadott, ki nem írt szavazatok visszajátszása (séma után)
+init_vote_journal(app, db)
+
+# Szerver oldali kör időzítő: a szavazási idő végén magától lezárja a kört
+init_round_timer(app, db)
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
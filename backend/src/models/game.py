@@ -1,8 +1,15 @@
 from src.models.user import db
+from sqlalchemy import and_, exists, insert, literal, or_, select
+from sqlalchemy.orm import selectinload
+from src.services.lun_engine import lowest_unique_number
 from datetime import datetime
 import json
 
 class Player(db.Model):
+    __table_args__ = (
+        db.Index('ix_player_team_active', 'team_id', 'is_active'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(80), nullable=False)
     nickname = db.Column(db.String(100), nullable=False)
@@ -26,15 +33,21 @@ class Player(db.Model):
         }
 
 class Team(db.Model):
+    __table_args__ = (
+        db.Index('ix_team_game_active', 'game_id', 'is_active'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     game_id = db.Column(db.Integer, db.ForeignKey('game.id'), nullable=False)
     score = db.Column(db.Integer, default=0)
     is_active = db.Column(db.Boolean, default=True)
+    # Aktív tagok száma; a játékos módosításakor session esemény tartja karban (team_counts)
+    member_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Kapcsolatok
-    players = db.relationship('Player', backref='team', lazy=True)
+    # Kapcsolatok (a tagokat csapatlistánként egyetlen IN lekérdezéssel töltjük)
+    players = db.relationship('Player', backref='team', lazy='selectin')
     votes = db.relationship('Vote', backref='team', lazy=True)
 
     def __repr__(self):
@@ -47,7 +60,7 @@ class Team(db.Model):
             'game_id': self.game_id,
             'score': self.score,
             'is_active': self.is_active,
-            'member_count': len(self.players),
+            'member_count': self.member_count,
             'members': [player.to_dict() for player in self.players if player.is_active],
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
@@ -58,7 +71,7 @@ class Game(db.Model):
     state = db.Column(db.String(20), nullable=False, default="registration")  # registration, pairing, playing, quiz, finished
     current_round = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    is_active = db.Column(db.Boolean, default=True)
+    is_active = db.Column(db.Boolean, default=True, index=True)
     
     # Moderátor beállítások
     is_paused = db.Column(db.Boolean, default=False)
@@ -71,102 +84,106 @@ class Game(db.Model):
     def __repr__(self):
         return f'<Game {self.name} - {self.state}>'
     
-    def get_smallest_team(self):
-        """Legkisebb létszámú aktív csapat visszaadása"""
-        active_teams = [team for team in self.teams if team.is_active and len(team.players) > 0]
-        if not active_teams:
-            return None
-        return min(active_teams, key=lambda t: len([p for p in t.players if p.is_active]))
-    
-    def get_eliminated_players(self):
-        """Kiesett játékosok listája (akiknek nincs aktív csapatuk)"""
+    def _eliminated_players_select(self, *columns):
+        """Csapat nélküli vagy inaktív csapatú aktív játékosok, akiknek még nincs tokenjük ebben a körben
+
+        Egyetlen anti-join (NOT EXISTS) lekérdezés; a kiesett csapat ennek a játéknak a csapata.
+        """
         from .supporter import SupporterToken
-        all_players = Player.query.filter_by(is_active=True).all()
-        eliminated = []
-        
-        for player in all_players:
-            # Ha nincs csapata vagy a csapata inaktív
-            if not player.team or not player.team.is_active:
-                # Ellenőrizzük, hogy van-e már aktív token-je
-                existing_token = SupporterToken.query.filter_by(
-                    player_id=player.id,
-                    game_id=self.id,
-                    round_number=self.current_round,
-                    is_active=True
-                ).first()
-                
-                if not existing_token:
-                    eliminated.append(player)
-        
-        return eliminated
+        has_token = exists().where(
+            SupporterToken.player_id == Player.id,
+            SupporterToken.game_id == self.id,
+            SupporterToken.round_number == self.current_round,
+            SupporterToken.is_active == True
+        )
+        return select(*columns).select_from(Player).outerjoin(Team, Team.id == Player.team_id).where(
+            Player.is_active == True,
+            or_(Player.team_id.is_(None), and_(Team.game_id == self.id, Team.is_active == False)),
+            ~has_token
+        )
+
+    def get_eliminated_players(self):
+        """Kiesett játékosok listája (akiknek nincs aktív csapatuk és még nincs tokenjük)"""
+        return db.session.scalars(self._eliminated_players_select(Player).order_by(Player.id)).all()
     
     def create_supporter_tokens(self):
-        """Szurkolói tokenek létrehozása kiesett játékosoknak"""
+        """Szurkolói tokenek létrehozása kiesett játékosoknak
+
+        A kiesettek keresése és a tokenek beszúrása egyetlen INSERT ... SELECT
+        utasítás, a kiesettek számától függetlenül.
+        """
         from .supporter import SupporterToken
-        eliminated_players = self.get_eliminated_players()
-        tokens_created = 0
-        
-        for player in eliminated_players:
-            token = SupporterToken(
-                player_id=player.id,
-                game_id=self.id,
-                round_number=self.current_round
-            )
-            db.session.add(token)
-            tokens_created += 1
+        from src.services.state_cache import state_cache
+        now = datetime.utcnow()
+        eliminated = self._eliminated_players_select(
+            Player.id,
+            literal(self.id),
+            literal(self.current_round),
+            literal(True),
+            literal(now),
+            literal(now)
+        )
+        tokens_created = db.session.execute(insert(SupporterToken).from_select(
+            ['player_id', 'game_id', 'round_number', 'is_active', 'created_at', 'updated_at'],
+            eliminated
+        )).rowcount
         
         if tokens_created > 0:
             db.session.commit()
+            # A Core beszúrást a session események nem látják
+            state_cache.bump({self.id}, changed_tables={'supporter_tokens'})
         
         return tokens_created
 
+    def get_team_sizes(self):
+        """Nem üres aktív csapatok tagszáma {team_id: member_count} - a tagok betöltése nélkül"""
+        return dict(db.session.query(Team.id, Team.member_count).filter(
+            Team.game_id == self.id,
+            Team.is_active == True,
+            Team.member_count > 0
+        ).order_by(Team.id))
+
     def get_smallest_team(self):
         """Legkisebb aktív csapat megkeresése"""
-        active_teams = [team for team in self.teams if team.is_active and team.member_count > 0]
-        
-        if not active_teams:
-            return None
-        
-        # Legkisebb tagszámú csapat keresése
-        smallest_team = min(active_teams, key=lambda team: team.member_count)
-        return smallest_team
+        return Team.query.filter(
+            Team.game_id == self.id,
+            Team.is_active == True,
+            Team.member_count > 0
+        ).order_by(Team.member_count, Team.id).first()
     
     def balance_teams(self):
         """Csapatok kiegyensúlyozása - nagy különbségek csökkentése"""
-        active_teams = [team for team in self.teams if team.is_active and team.member_count > 0]
+        team_sizes = list(self.get_team_sizes().values())
         
-        if len(active_teams) < 2:
+        if len(team_sizes) < 2:
             return False
         
-        # Csapatok rendezése tagszám szerint
-        active_teams.sort(key=lambda team: team.member_count)
-        smallest_team = active_teams[0]
-        largest_team = active_teams[-1]
-        
         # Ha a különbség túl nagy (több mint 2 fő), balansz szükséges
-        if largest_team.member_count - smallest_team.member_count > 2:
-            return True
-        
-        return False
+        return max(team_sizes) - min(team_sizes) > 2
     
     def prevent_snowball_effect(self):
         """Snowball effect megelőzése - túl erős csapatok korlátozása"""
-        active_teams = [team for team in self.teams if team.is_active and team.member_count > 0]
+        team_sizes = list(self.get_team_sizes().values())
         
-        if not active_teams:
+        if not team_sizes:
             return False
         
-        total_players = sum(team.member_count for team in active_teams)
-        average_team_size = total_players / len(active_teams)
+        average_team_size = sum(team_sizes) / len(team_sizes)
         
         # Ha van csapat, amely 50%-kal nagyobb az átlagnál
-        for team in active_teams:
-            if team.member_count > average_team_size * 1.5:
-                return True
-        
-        return False
+        return any(size > average_team_size * 1.5 for size in team_sizes)
+
+    def get_active_teams(self):
+        """Aktív csapatok a tagjaikkal együtt - a csapatszámtól független, konstans számú lekérdezéssel"""
+        # populate_existing: a commit után lejárt, már betöltött csapatok tagjait is egyben töltjük
+        return Team.query.options(selectinload(Team.players)).filter_by(
+            game_id=self.id,
+            is_active=True
+        ).populate_existing().all()
 
     def to_dict(self):
+        active_teams = self.get_active_teams()
+        
         return {
             'id': self.id,
             'name': self.name,
@@ -174,12 +191,16 @@ class Game(db.Model):
             'current_round': self.current_round,
             'is_active': self.is_active,
             'is_paused': self.is_paused,
-            'team_count': len([team for team in self.teams if team.is_active]),
-            'teams': [team.to_dict() for team in self.teams if team.is_active],
+            'team_count': len(active_teams),
+            'teams': [team.to_dict() for team in active_teams],
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
 class Round(db.Model):
+    __table_args__ = (
+        db.Index('ix_round_game_number_state', 'game_id', 'round_number', 'state'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     game_id = db.Column(db.Integer, db.ForeignKey('game.id'), nullable=False)
     round_number = db.Column(db.Integer, nullable=False)
@@ -200,24 +221,30 @@ class Round(db.Model):
     votes = db.relationship('Vote', backref='round', lazy=True)
     winner_team = db.relationship('Team', foreign_keys=[winner_team_id])
     
-    def get_team_final_votes(self):
-        """Minden csapat végső szavazatait adja vissza (csapattagok utolsó szavazata alapján)"""
+    def get_team_final_votes(self, votes=None):
+        """Minden csapat végső szavazatait adja vissza (csapattagok utolsó szavazata alapján)
+
+        A kör összes szavazatát egyetlen lekérdezéssel töltjük be, és játékosonként
+        indexeljük; ha már be vannak töltve, a votes paraméterben átadhatók.
+        """
         team_votes = {}
+        if votes is None:
+            votes = Vote.query.filter_by(round_id=self.id).all()
+        latest_votes = latest_votes_by_player(votes)
         
-        # Minden csapat aktív tagjai
-        game = Game.query.get(self.game_id)
-        active_teams = [team for team in game.teams if team.is_active]
+        # Minden csapat aktív tagjai (csapatok és tagok egy-egy lekérdezéssel)
+        active_teams = Team.query.options(selectinload(Team.players)).filter_by(
+            game_id=self.game_id,
+            is_active=True
+        ).populate_existing().all()
         
         for team in active_teams:
             team_member_votes = []
             
             # Csapat minden aktív tagjának utolsó szavazata
-            for member in team.members:
+            for member in team.players:
                 if member.is_active:
-                    last_vote = Vote.query.filter_by(
-                        player_id=member.id,
-                        round_id=self.id
-                    ).order_by(Vote.updated_at.desc()).first()
+                    last_vote = latest_votes.get(member.id)
                     
                     if last_vote:
                         team_member_votes.append(last_vote.number)
@@ -254,29 +281,21 @@ class Round(db.Model):
         
         return team_votes
     
-    def calculate_winner(self):
+    def calculate_winner(self, team_votes=None):
         """Nyertes csapat kiszámítása az új logika szerint"""
-        team_votes = self.get_team_final_votes()
+        if team_votes is None:
+            team_votes = self.get_team_final_votes()
         
         if not team_votes:
-            return None
+            return None, None, None
         
         # Legkisebb egyedi szám keresése
-        all_numbers = [vote_data['final_number'] for vote_data in team_votes.values()]
-        number_counts = {}
-        
-        for number in all_numbers:
-            number_counts[number] = number_counts.get(number, 0) + 1
-        
-        # Egyedi számok (csak egy csapat szavazott rá)
-        unique_numbers = [num for num, count in number_counts.items() if count == 1]
+        winner_team_id, winning_number = lowest_unique_number(
+            (team_id, vote_data['final_number']) for team_id, vote_data in team_votes.items()
+        )
         
-        if unique_numbers:
-            winning_number = min(unique_numbers)
-            # Nyertes csapat keresése
-            for team_id, vote_data in team_votes.items():
-                if vote_data['final_number'] == winning_number:
-                    return team_id, winning_number, vote_data
+        if winner_team_id is not None:
+            return winner_team_id, winning_number, team_votes[winner_team_id]
         
         return None, None, None
     
@@ -291,7 +310,8 @@ class Round(db.Model):
         return elapsed.total_seconds() <= (self.voting_duration_seconds + grace_period)
 
     def to_dict(self):
-        team_votes = self.get_team_final_votes()
+        votes = self.votes
+        team_votes = self.get_team_final_votes(votes)
         
         return {
             'id': self.id,
@@ -307,11 +327,17 @@ class Round(db.Model):
             'voting_duration_seconds': self.voting_duration_seconds,
             'is_voting_active': self.is_voting_active(),
             'team_votes': team_votes,
-            'votes': [vote.to_dict() for vote in self.votes],
+            'votes': [vote.to_dict() for vote in votes],
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
 class Vote(db.Model):
+    __table_args__ = (
+        # Játékosonként és körönként egy szavazat (módosításkor felülíródik)
+        db.Index('uq_vote_player_round', 'player_id', 'round_id', unique=True),
+        db.Index('ix_vote_round_number', 'round_id', 'number'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     team_id = db.Column(db.Integer, db.ForeignKey('team.id'), nullable=False)
     player_id = db.Column(db.Integer, db.ForeignKey('player.id'), nullable=False)  # Új: egyéni szavazatok
@@ -320,8 +346,8 @@ class Vote(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Új: utolsó módosítás
     
-    # Kapcsolatok
-    player = db.relationship('Player', backref='votes')
+    # Kapcsolatok (a játékos nevét minden szerializáláskor használjuk)
+    player = db.relationship('Player', backref='votes', lazy='joined')
 
     def __repr__(self):
         return f'<Vote {self.number} - Player {self.player_id} - Team {self.team_id}>'
@@ -338,6 +364,15 @@ class Vote(db.Model):
             'player_name': self.player.name if self.player else None
         }
 
+def latest_votes_by_player(votes):
+    """Játékosonként a legutóbb módosított szavazat (player_id -> Vote)"""
+    latest = {}
+    for vote in votes:
+        current = latest.get(vote.player_id)
+        if current is None or (vote.updated_at or datetime.min) > (current.updated_at or datetime.min):
+            latest[vote.player_id] = vote
+    return latest
+
 class QuizQuestion(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     question = db.Column(db.Text, nullable=False)
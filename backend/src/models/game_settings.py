@@ -5,6 +5,8 @@ Játék gyorsítási beállítások
 from datetime import datetime
 from .user import db
 
+DEFAULT_EARLY_CLOSE_SETTLE_SECONDS = 2
+
 class GameSettings(db.Model):
     """Játék beállítások - moderátor által állítható"""
     
@@ -16,6 +18,8 @@ class GameSettings(db.Model):
     # Időzítés beállítások
     voting_duration_seconds = db.Column(db.Integer, default=20)  # 20 mp (korábban 30)
     is_sprint_mode = db.Column(db.Boolean, default=False)  # Sprint mód: 15 mp
+    early_close_enabled = db.Column(db.Boolean, default=False)  # Korai zárás, ha minden aktív tag szavazott
+    early_close_settle_seconds = db.Column(db.Integer, default=DEFAULT_EARLY_CLOSE_SETTLE_SECONDS)  # Ennyi idő még marad meggondolni
     
     # Játékgyorsítás beállítások
     protection_enabled = db.Column(db.Boolean, default=True)  # Védettség: visszarablás tiltása
@@ -32,6 +36,12 @@ class GameSettings(db.Model):
             return 15
         return self.voting_duration_seconds
     
+    def get_early_close_settle_seconds(self):
+        """Korai zárás előtti várakozás (régi sorokban NULL: alapérték)"""
+        if self.early_close_settle_seconds is None:
+            return DEFAULT_EARLY_CLOSE_SETTLE_SECONDS
+        return self.early_close_settle_seconds
+    
     def get_number_range(self):
         """Aktuális számmező tartomány"""
         return (1, self.number_range_max)
@@ -50,6 +60,8 @@ class GameSettings(db.Model):
             'game_id': self.game_id,
             'voting_duration_seconds': self.voting_duration_seconds,
             'is_sprint_mode': self.is_sprint_mode,
+            'early_close_enabled': bool(self.early_close_enabled),
+            'early_close_settle_seconds': self.get_early_close_settle_seconds(),
             'protection_enabled': self.protection_enabled,
             'rescue_round_enabled': self.rescue_round_enabled,
             'number_range_max': self.number_range_max,
@@ -0,0 +1,82 @@
+"""
+Meglévő app.db fájlok sémájának frissítése (hiányzó oszlopok, indexek, egyediség)
+"""
+
+from sqlalchemy import inspect, text
+
+from .user import db
+
+# Ha egy játékos többször is szavazott egy körben, csak a legutóbbi marad meg
+DEDUPLICATE_VOTES_SQL = """
+DELETE FROM vote
+WHERE player_id IS NOT NULL
+  AND id NOT IN (
+    SELECT (
+        SELECT latest.id FROM vote AS latest
+        WHERE latest.player_id = grouped.player_id AND latest.round_id = grouped.round_id
+        ORDER BY latest.updated_at DESC, latest.id DESC
+        LIMIT 1
+    )
+    FROM vote AS grouped
+    WHERE grouped.player_id IS NOT NULL
+    GROUP BY grouped.player_id, grouped.round_id
+  )
+"""
+
+# Régi sémánál az új team.member_count oszlop feltöltése a tényleges aktív tagszámmal
+RECOUNT_TEAM_MEMBERS_SQL = """
+UPDATE team SET member_count = (
+    SELECT COUNT(*) FROM player
+    WHERE player.team_id = team.id AND player.is_active = 1
+)
+"""
+
+def add_missing_columns(connection):
+    """Modellben szereplő, de a táblából hiányzó oszlopok felvétele
+
+    SQLite-ban NOT NULL oszlop alapérték nélkül nem adható hozzá, ezért az új
+    oszlopok nullable-ként jönnek létre; a meglévő sorokban NULL marad az értékük.
+    """
+    inspector = inspect(connection)
+    added = []
+
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            added.append(f'{table.name}.{column.name}')
+
+    return added
+
+def create_missing_indexes(connection):
+    """A modellekben deklarált indexek létrehozása, ha még nem léteznek"""
+    inspector = inspect(connection)
+    created = []
+
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if index.unique and table.name == 'vote':
+                connection.execute(text(DEDUPLICATE_VOTES_SQL))
+            index.create(connection)
+            created.append(index.name)
+
+    return created
+
+def upgrade_schema():
+    """Teljes sémafrissítés egy tranzakcióban; többször futtatva sem változtat semmit"""
+    with db.engine.begin() as connection:
+        added_columns = add_missing_columns(connection)
+        if 'team.member_count' in added_columns:
+            connection.execute(text(RECOUNT_TEAM_MEMBERS_SQL))
+        created_indexes = create_missing_indexes(connection)
+    return added_columns, created_indexes
@@ -9,6 +9,12 @@ class SupporterToken(db.Model):
     """Szurkolói token model - kiesett játékosok tippelési lehetősége"""
     
     __tablename__ = 'supporter_tokens'
+    __table_args__ = (
+        db.Index('ix_supporter_token_lookup', 'player_id', 'game_id', 'round_number', 'is_active'),
+        # Kör kiértékelése: (játék, kör) aktív tokenjei tipp szerint
+        db.Index('ix_supporter_token_round', 'game_id', 'round_number', 'is_active',
+                 'predicted_team_id', 'predicted_number'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     player_id = db.Column(db.Integer, db.ForeignKey('player.id'), nullable=False)
@@ -1,27 +1,27 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response, current_app, stream_with_context
 from src.models.game import Player, Team, Game, Round, Vote, QuizQuestion, db
+from src.services import metrics
+from src.services.active_game import active_games, get_active_game, get_or_create_active_game
+from src.services.auto_pair import AutoPairError, PairingConflict, auto_pair
+from src.services.guest_import import BATCH_SIZE as GUEST_BATCH_SIZE, guest_tokens, import_guests, names_from_json, read_guest_names, render_guest_tokens
+from src.services.lun_engine import lowest_unique_number
+from src.services.name_allocator import name_allocator
+from src.services.round_timer import round_timer, voting_timing
+from src.services.settings_cache import settings_cache
+from src.services.state_cache import state_cache
+from src.services.state_stream import generate_state_events
+from src.services.team_balancer import DEFAULT_MAX_SPREAD, BalanceConflict, balance_teams
+from src.services.team_counts import check_member_counts
+from src.services.vote_buffer import vote_buffer
+import io
+import json
 import random
+import time
 import uuid
 from collections import Counter
 
 game_bp = Blueprint('game', __name__)
 
-# Vicces esküvői becenevek
-WEDDING_NICKNAMES = [
-    'Nászmester', 'Koszorúslány', 'Vőfély', 'Menyasszonytáncoltató', 'Anyós-álom',
-    'Torta-őrző', 'Pezsgő-nyitó', 'Rizs-szóró', 'Csokor-fogó', 'Gyűrű-hordó',
-    'Tánc-király', 'Ital-kóstoló', 'Fotó-bombázó', 'Köszöntő-mester', 'Parti-állat',
-    'Menyasszonyi-ruha-őr', 'Vőlegény-segéd', 'Esküvői-DJ', 'Torta-kóstoló', 'Virágszóró'
-]
-
-# Vicces csapatnevek
-TEAM_NAMES = [
-    'Tüllkommandó', 'Csokornyakkendő-maffia', 'Lakodalmas Lámák', 'A Gyűrűk Urai',
-    'Váltságdíj a Menyasszonyért', 'Pezsgőpukkantók', 'Torta-kommandó', 'Az Igen Bajnokai',
-    'Csokor-dobó Brigád', 'Rizsszórás Mesterei', 'A Házasság Huszárjai', 'Parti-piramisok',
-    'Esküvői Elit', 'Menyasszonyi Maffia', 'Vőlegény Vikingek', 'Lakodalmas Legendák'
-]
-
 @game_bp.route('/register', methods=['POST'])
 def register_player():
     """Játékos regisztráció"""
@@ -35,22 +35,11 @@ def register_player():
         # Egyedi session ID generálása
         session_id = str(uuid.uuid4())
         
-        # Véletlenszerű becenév választása
-        used_nicknames = [p.nickname for p in Player.query.filter_by(is_active=True).all()]
-        available_nicknames = [n for n in WEDDING_NICKNAMES if n not in used_nicknames]
-        
-        if not available_nicknames:
-            # Ha elfogytak a becenevek, újra használjuk őket
-            available_nicknames = WEDDING_NICKNAMES
-        
-        nickname = random.choice(available_nicknames)
-        
         # Aktív játék keresése vagy létrehozása
-        game = Game.query.filter_by(is_active=True).first()
-        if not game:
-            game = Game(name="Esküvői Kvíz", state="registration")
-            db.session.add(game)
-            db.session.commit()
+        game = get_or_create_active_game()
+        
+        # Szabad becenév a készletből (elfogyás után sorszámozott változat)
+        nickname = name_allocator.nickname(game.id)
         
         # Játékos létrehozása
         player = Player(
@@ -72,6 +61,33 @@ def register_player():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@game_bp.route('/join', methods=['POST'])
+def join_with_token():
+    """Belépés előre regisztrált vendégként (a vendéglista importjakor kapott token)"""
+    try:
+        data = request.json
+        session_id = data.get('token', '').strip()
+        
+        if not session_id:
+            return jsonify({'error': 'A token megadása kötelező'}), 400
+        
+        player = Player.query.filter_by(session_id=session_id, is_active=True).first()
+        if not player:
+            return jsonify({'error': 'Érvénytelen vagy lejárt token'}), 404
+        
+        game = get_active_game()
+        if not game:
+            return jsonify({'error': 'Nincs aktív játék'}), 404
+        
+        return jsonify({
+            'success': True,
+            'player': player.to_dict(),
+            'game': game.to_dict()
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @game_bp.route('/players', methods=['GET'])
 def get_players():
     """Aktív játékosok listája"""
@@ -108,18 +124,12 @@ def create_pair():
             return jsonify({'error': 'Az egyik játékos már csapatban van'}), 400
         
         # Aktív játék lekérése
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
-        # Csapatnév választása
-        used_team_names = [t.name for t in Team.query.filter_by(game_id=game.id, is_active=True).all()]
-        available_team_names = [n for n in TEAM_NAMES if n not in used_team_names]
-        
-        if not available_team_names:
-            available_team_names = TEAM_NAMES
-        
-        team_name = random.choice(available_team_names)
+        # Szabad csapatnév a játék készletéből
+        team_name = name_allocator.team_name(game.id)
         
         # Csapat létrehozása
         team = Team(
@@ -147,23 +157,49 @@ def create_pair():
 
 @game_bp.route('/game/state', methods=['GET'])
 def get_game_state():
-    """Játék állapotának lekérése"""
+    """Játék állapotának lekérése (ETag alapján 304, ha nem változott)"""
     try:
-        game = Game.query.filter_by(is_active=True).first()
-        if not game:
+        snapshot = state_cache.get_active_snapshot(build_state_payload)
+        if not snapshot:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
-        return jsonify({
-            'game': game.to_dict()
-        })
+        response = current_app.response_class(snapshot.body, mimetype='application/json')
+        response.set_etag(snapshot.etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def build_state_payload():
+    """Aktív játék állapotának szerializálása a gyorsítótár számára"""
+    try:
+        game = get_active_game()
+        if not game:
+            return None, None
+        return game.id, current_app.json.dumps({'game': game.to_dict()})
+    finally:
+        # A hosszú életű stream ne tartson meg adatbázis kapcsolatot
+        db.session.remove()
+
+@game_bp.route('/game/stream', methods=['GET'])
+def stream_game_state():
+    """Játék állapot push értesítések (SSE) - csak változáskor küld"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    
+    return Response(
+        stream_with_context(generate_state_events(build_state_payload, last_event_id)),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @game_bp.route('/game/start-pairing', methods=['POST'])
 def start_pairing():
     """Párválasztás fázis indítása"""
     try:
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
@@ -178,11 +214,59 @@ def start_pairing():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@game_bp.route('/moderator/auto-pair', methods=['POST'])
+def auto_pair_players():
+    """Automatikus csapatbeosztás (moderátor funkció, párválasztás fázisban)
+
+    team_size: csapatlétszám (alapértelmezés 2), keep_together: együtt tartandó
+    játékos azonosító csoportok, keep_apart: szétválasztandó párok,
+    seed: ismételhető beosztás, dry_run: csak előnézet.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        dry_run = bool(data.get('dry_run'))
+        
+        game = get_active_game()
+        if not game:
+            return jsonify({'error': 'Nincs aktív játék'}), 404
+        
+        if game.state != 'pairing':
+            return jsonify({'error': 'Automatikus beosztás csak párválasztás fázisban lehetséges'}), 400
+        
+        started = time.perf_counter()
+        assignments = auto_pair(
+            game,
+            team_size=int(data.get('team_size', 2)),
+            keep_together=data.get('keep_together') or [],
+            keep_apart=data.get('keep_apart') or [],
+            seed=data.get('seed'),
+            dry_run=dry_run
+        )
+        
+        return jsonify({
+            'success': True,
+            'dry_run': dry_run,
+            'message': f'{len(assignments)} csapat {"tervezve" if dry_run else "létrehozva"}',
+            'team_count': len(assignments),
+            'player_count': sum(len(team.member_ids) for team in assignments),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000),
+            'teams': [team._asdict() for team in assignments]
+        }), 200 if dry_run else 201
+        
+    except (AutoPairError, TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except PairingConflict as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @game_bp.route('/game/start-playing', methods=['POST'])
 def start_playing():
     """Játék fázis indítása"""
     try:
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
@@ -204,10 +288,16 @@ def start_playing():
         db.session.add(round1)
         db.session.commit()
         
+        # Automatikus lezárás a szavazási idő végén
+        round_timer.schedule(round1)
+        
         return jsonify({
             'success': True,
             'game': game.to_dict(),
-            'round': round1.to_dict()
+            'round': {
+                **round1.to_dict(),
+                **voting_timing(round1, settings_cache.get(game.id).voting_duration)
+            }
         })
     except Exception as e:
         db.session.rollback()
@@ -233,7 +323,7 @@ def submit_vote():
             return jsonify({'error': 'Csapat nem található'}), 404
         
         # Aktív kör lekérése
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
@@ -264,6 +354,7 @@ def submit_vote():
         
         db.session.add(vote)
         db.session.commit()
+        metrics.record_vote(changed=False)
         
         return jsonify({
             'success': True,
@@ -277,8 +368,10 @@ def submit_vote():
 @game_bp.route('/round/evaluate', methods=['POST'])
 def evaluate_round():
     """Kör kiértékelése"""
+    started = time.perf_counter()
+    closed_round_id = None
     try:
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
@@ -291,34 +384,27 @@ def evaluate_round():
         if not current_round:
             return jsonify({'error': 'Nincs aktív szavazási kör'}), 404
         
+        # Pufferelt szavazatok kiírása a kiértékelés előtt (a kör ezután nem fogad szavazatot)
+        closed_round_id = current_round.id
+        if not vote_buffer.flush(close_round_id=closed_round_id):
+            vote_buffer.reopen_round(closed_round_id)
+            return jsonify({'error': 'A szavazatok mentése folyamatban, próbáld újra'}), 503
+        
         # Szavazatok lekérése
         votes = Vote.query.filter_by(round_id=current_round.id).all()
         
         if not votes:
+            # A kör nyitva marad: a szavazás folytatható
+            vote_buffer.reopen_round(closed_round_id)
             return jsonify({'error': 'Nincsenek szavazatok'}), 400
         
         # Számok számlálása
         vote_counts = Counter([vote.number for vote in votes])
         
         # Legkisebb egyedi szám keresése
-        winner_team_id = None
-        winning_number = None
-        
-        # Rendezzük a számokat növekvő sorrendben
-        sorted_numbers = sorted(vote_counts.keys())
-        
-        for number in sorted_numbers:
-            if vote_counts[number] == 1:  # Egyedi szám
-                # Megkeressük a csapatot, aki ezt a számot választotta
-                winning_vote = Vote.query.filter_by(
-                    round_id=current_round.id,
-                    number=number
-                ).first()
-                
-                if winning_vote:
-                    winner_team_id = winning_vote.team_id
-                    winning_number = number
-                    break
+        winner_team_id, winning_number = lowest_unique_number(
+            (vote.team_id, vote.number) for vote in votes
+        )
         
         # Kör állapotának frissítése
         if winner_team_id:
@@ -329,6 +415,7 @@ def evaluate_round():
             current_round.state = "completed"
         
         db.session.commit()
+        metrics.finalize_duration.observe(time.perf_counter() - started)
         
         result = {
             'success': True,
@@ -343,6 +430,8 @@ def evaluate_round():
         
     except Exception as e:
         db.session.rollback()
+        if closed_round_id is not None:
+            vote_buffer.reopen_round(closed_round_id)
         return jsonify({'error': str(e)}), 500
 
 @game_bp.route('/quiz/question', methods=['GET'])
@@ -386,7 +475,7 @@ def submit_quiz_answer():
             return jsonify({'error': 'Csapat ID megadása kötelező'}), 400
         
         # Aktív kör lekérése
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
@@ -477,7 +566,7 @@ def steal_player():
 def start_round():
     """Új kör indítása (moderátor funkció)"""
     try:
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
@@ -486,12 +575,25 @@ def start_round():
         game.state = 'playing'
         game.is_paused = False
         
+        # Az új kör szavazása azonnal indul
+        new_round = Round(
+            game_id=game.id,
+            round_number=game.current_round,
+            state="voting"
+        )
+        db.session.add(new_round)
+        
         db.session.commit()
         
+        # Automatikus lezárás a szavazási idő végén
+        round_timer.schedule(new_round)
+        
         return jsonify({
             'success': True,
             'message': f'{game.current_round}. kör elkezdődött!',
-            'round': game.current_round
+            'round': game.current_round,
+            'round_id': new_round.id,
+            **voting_timing(new_round, settings_cache.get(game.id).voting_duration)
         })
         
     except Exception as e:
@@ -502,7 +604,7 @@ def start_round():
 def pause_game():
     """Játék szüneteltetése (moderátor funkció)"""
     try:
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
@@ -528,7 +630,7 @@ def drink_break():
         data = request.json
         message = data.get('message', 'Ital szünet! 🍻')
         
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
@@ -537,7 +639,7 @@ def drink_break():
         action = ModeratorAction(
             game_id=game.id,
             action_type='drink_break',
-            description=message
+            action_data=json.dumps({'message': message})
         )
         db.session.add(action)
         db.session.commit()
@@ -571,24 +673,21 @@ def manual_team_change():
         
         old_team_id = player.team_id
         player.team_id = target_team_id
+        # A tagszámokat a flush frissíti (team_counts)
+        db.session.flush()
         
-        # Csapat tagszámok frissítése
-        if old_team_id:
+        # Ha a régi csapat üres lett, inaktiváljuk
+        if old_team_id and old_team_id != target_team.id:
             old_team = Team.query.get(old_team_id)
-            if old_team:
-                old_team.member_count -= 1
-                # Ha a csapat üres lett, inaktiváljuk
-                if old_team.member_count <= 0:
-                    old_team.is_active = False
-        
-        target_team.member_count += 1
+            if old_team and old_team.member_count <= 0:
+                old_team.is_active = False
         
         # Moderátor akció rögzítése
         from src.models.supporter import ModeratorAction
         action = ModeratorAction(
             game_id=target_team.game_id,
             action_type='manual_team_change',
-            description=f'{player.name} áthelyezve {target_team.name} csapatba'
+            action_data=json.dumps({'player_id': player.id, 'from_team_id': old_team_id, 'to_team_id': target_team.id})
         )
         db.session.add(action)
         db.session.commit()
@@ -627,6 +726,8 @@ def reset_game():
             team.is_active = False
         
         db.session.commit()
+        active_games.invalidate()
+        name_allocator.reset()
         
         return jsonify({
             'success': True,
@@ -637,11 +738,65 @@ def reset_game():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@game_bp.route('/moderator/import-guests', methods=['POST'])
+def import_guest_list():
+    """Vendéglista előregisztrálása (moderátor funkció)
+
+    Feltöltött CSV/JSON fájl ('file' mező) vagy JSON törzs {"guests": [...]}.
+    include_tokens=1: a válasz tartalmazza a vendégenkénti belépő tokeneket,
+    tokens_format=csv: a tokenek letölthető CSV fájlként (QR kód nyomtatáshoz).
+    """
+    try:
+        options = request.form if request.files else (request.get_json(silent=True) or {})
+        upload = request.files.get('file')
+        
+        if upload:
+            stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig')
+            names = read_guest_names(stream, options.get('format'), upload.filename, upload.mimetype)
+        elif 'guests' in options:
+            names = names_from_json(options['guests'])
+        else:
+            return jsonify({'error': 'Vendéglista fájl vagy guests mező szükséges'}), 400
+        
+        result = import_guests(
+            names,
+            batch_size=int(options.get('batch_size', GUEST_BATCH_SIZE)),
+            skip_existing=str(options.get('skip_existing', '1')).lower() not in ('0', 'false')
+        )
+        
+        base_url = options.get('base_url')
+        if options.get('tokens_format') == 'csv':
+            return Response(
+                render_guest_tokens(result.guests, 'csv', base_url),
+                content_type='text/csv; charset=utf-8',
+                headers={'Content-Disposition': 'attachment; filename=guest_tokens.csv'}
+            )
+        
+        response = {
+            'success': True,
+            'message': f'{len(result.guests)} vendég előregisztrálva',
+            'created': len(result.guests),
+            'skipped_existing': result.skipped_existing,
+            'skipped_invalid': result.skipped_invalid,
+            'batches': result.batches,
+            'elapsed_ms': result.elapsed_ms
+        }
+        if str(options.get('include_tokens', '')).lower() in ('1', 'true'):
+            response['guests'] = guest_tokens(result.guests, base_url)
+        return jsonify(response), 201
+        
+    except (ValueError, UnicodeDecodeError) as e:
+        db.session.rollback()
+        return jsonify({'error': f'Hibás vendéglista: {e}'}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @game_bp.route('/moderator/stats', methods=['GET'])
 def get_game_stats():
     """Játék statisztikák lekérése (moderátor funkció)"""
     try:
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
@@ -670,7 +825,7 @@ def get_game_stats():
             },
             'recent_actions': [{
                 'type': action.action_type,
-                'description': action.description,
+                'data': json.loads(action.action_data) if action.action_data else None,
                 'created_at': action.created_at.isoformat()
             } for action in recent_actions]
         })
@@ -684,7 +839,7 @@ def get_game_stats():
 def check_team_balance():
     """Csapat egyensúly ellenőrzése"""
     try:
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
@@ -692,15 +847,14 @@ def check_team_balance():
         snowball_risk = game.prevent_snowball_effect()
         smallest_team = game.get_smallest_team()
         
-        active_teams = [team for team in game.teams if team.is_active and team.member_count > 0]
-        team_sizes = [team.member_count for team in active_teams]
+        team_sizes = list(game.get_team_sizes().values())
         
         return jsonify({
             'success': True,
             'needs_balance': needs_balance,
             'snowball_risk': snowball_risk,
             'smallest_team': smallest_team.to_dict() if smallest_team else None,
-            'team_count': len(active_teams),
+            'team_count': len(team_sizes),
             'team_sizes': team_sizes,
             'size_difference': max(team_sizes) - min(team_sizes) if team_sizes else 0
         })
@@ -708,59 +862,87 @@ def check_team_balance():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@game_bp.route('/balance/auto-balance', methods=['POST'])
-def auto_balance_teams():
-    """Automatikus csapat kiegyensúlyozás"""
+@game_bp.route('/balance/team-counts', methods=['GET', 'POST'])
+def check_team_counts():
+    """Tárolt csapat tagszámok összevetése a tényleges aktív tagokkal
+
+    GET csak jelenti az eltéréseket, POST ki is javítja őket.
+    """
     try:
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
-        active_teams = [team for team in game.teams if team.is_active and team.member_count > 0]
+        fix = request.method == 'POST'
+        drift = check_member_counts(game.id, fix=fix)
         
-        if len(active_teams) < 2:
-            return jsonify({'error': 'Nincs elég aktív csapat a kiegyensúlyozáshoz'}), 400
+        return jsonify({
+            'success': True,
+            'consistent': not drift,
+            'fixed': fix and bool(drift),
+            'drift': [item._asdict() for item in drift]
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@game_bp.route('/balance/auto-balance', methods=['POST'])
+def auto_balance_teams():
+    """Automatikus csapat kiegyensúlyozás
+
+    A legkevesebb áthelyezéssel hozza a csapatokat max_spread (alapértelmezés 1)
+    létszámkülönbségen belülre. protected_player_ids: nem mozgatható játékosok,
+    dry_run: csak az áthelyezési terv (előnézet).
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        dry_run = bool(data.get('dry_run'))
+        max_spread = int(data.get('max_spread', DEFAULT_MAX_SPREAD))
         
-        # Csapatok rendezése tagszám szerint
-        active_teams.sort(key=lambda team: team.member_count)
-        smallest_team = active_teams[0]
-        largest_team = active_teams[-1]
+        if max_spread < 1:
+            return jsonify({'error': 'A megengedett különbség legalább 1'}), 400
         
-        moves_made = 0
-        max_moves = 3  # Maximális áthelyezések száma
+        game = get_active_game()
+        if not game:
+            return jsonify({'error': 'Nincs aktív játék'}), 404
         
-        while (largest_team.member_count - smallest_team.member_count > 1 and 
-               moves_made < max_moves):
-            
-            # Egy játékos áthelyezése a legnagyobb csapatból a legkisebbbe
-            players_to_move = [p for p in Player.query.filter_by(team_id=largest_team.id, is_active=True).all()]
-            
-            if not players_to_move:
-                break
-            
-            player_to_move = random.choice(players_to_move)
-            
-            # Áthelyezés
-            player_to_move.team_id = smallest_team.id
-            largest_team.member_count -= 1
-            smallest_team.member_count += 1
-            
-            moves_made += 1
-            
-            # Frissítés a következő iterációhoz
-            active_teams.sort(key=lambda team: team.member_count)
-            smallest_team = active_teams[0]
-            largest_team = active_teams[-1]
+        moves, sizes_before, sizes_after = balance_teams(
+            game,
+            protected_player_ids=data.get('protected_player_ids') or [],
+            max_spread=max_spread,
+            dry_run=dry_run
+        )
         
-        db.session.commit()
+        if len(sizes_before) < 2:
+            return jsonify({'error': 'Nincs elég aktív csapat a kiegyensúlyozáshoz'}), 400
+        
+        # Nevek a tervhez (egy-egy lekérdezés)
+        team_names = dict(db.session.query(Team.id, Team.name).filter(Team.id.in_(sizes_before)))
+        player_names = dict(db.session.query(Player.id, Player.name).filter(
+            Player.id.in_([move.player_id for move in moves])
+        )) if moves else {}
         
         return jsonify({
             'success': True,
-            'moves_made': moves_made,
-            'message': f'{moves_made} játékos áthelyezve a kiegyensúlyozáshoz',
-            'teams': [team.to_dict() for team in active_teams]
+            'dry_run': dry_run,
+            'moves_made': 0 if dry_run else len(moves),
+            'message': f'{len(moves)} játékos áthelyezés {"tervezve" if dry_run else "végrehajtva"} a kiegyensúlyozáshoz',
+            'balanced': max(sizes_after.values()) - min(sizes_after.values()) <= max_spread,
+            'moves': [{
+                'player_id': move.player_id,
+                'player_name': player_names.get(move.player_id),
+                'from_team_id': move.from_team_id,
+                'from_team_name': team_names.get(move.from_team_id),
+                'to_team_id': move.to_team_id,
+                'to_team_name': team_names.get(move.to_team_id)
+            } for move in moves],
+            'team_sizes_before': sizes_before,
+            'team_sizes_after': sizes_after
         })
         
+    except BalanceConflict as e:
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -773,7 +955,7 @@ def coordinate_drink_break():
         message = data.get('message', 'Ital szünet! 🍻')
         duration_seconds = data.get('duration', 60)  # Alapértelmezett: 1 perc
         
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
@@ -785,22 +967,21 @@ def coordinate_drink_break():
         action = ModeratorAction(
             game_id=game.id,
             action_type='drink_break',
-            description=f'{message} (időtartam: {duration_seconds}s)'
+            action_data=json.dumps({'message': message, 'duration_seconds': duration_seconds})
         )
         db.session.add(action)
         
         db.session.commit()
         
         # Aktív csapatok és játékosok száma
-        active_teams = [team for team in game.teams if team.is_active]
-        total_players = sum(team.member_count for team in active_teams)
+        team_sizes = game.get_team_sizes()
         
         return jsonify({
             'success': True,
             'message': message,
             'duration_seconds': duration_seconds,
-            'teams_notified': len(active_teams),
-            'players_notified': total_players,
+            'teams_notified': len(team_sizes),
+            'players_notified': sum(team_sizes.values()),
             'game_paused': True
         })
         
@@ -812,7 +993,7 @@ def coordinate_drink_break():
 def resume_after_drink():
     """Játék folytatása ital szünet után"""
     try:
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
@@ -824,7 +1005,7 @@ def resume_after_drink():
         action = ModeratorAction(
             game_id=game.id,
             action_type='resume_game',
-            description='Játék folytatva ital szünet után'
+            action_data=json.dumps({'message': 'Játék folytatva ital szünet után'})
         )
         db.session.add(action)
         
@@ -844,7 +1025,7 @@ def resume_after_drink():
 def get_smallest_team():
     """Legkisebb csapat lekérése"""
     try:
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
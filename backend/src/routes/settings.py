@@ -6,22 +6,26 @@ from flask import Blueprint, request, jsonify
 from src.models.user import db
 from src.models.game import Game
 from src.models.game_settings import GameSettings, get_or_create_game_settings
+from src.services.active_game import active_games
+from src.services.round_timer import round_timer
+from src.services.settings_cache import settings_cache
 
 settings_bp = Blueprint('settings', __name__)
 
+# Egész számként várt beállítások
+INTEGER_SETTINGS = ('voting_duration_seconds', 'early_close_settle_seconds', 'number_range_max')
+
 @settings_bp.route('/settings/get', methods=['GET'])
 def get_game_settings():
     """Aktuális játék beállítások lekérése"""
     try:
-        game = Game.query.filter_by(is_active=True).first()
+        game = active_games.resolve()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
-        settings = get_or_create_game_settings(game.id)
-        
         return jsonify({
             'success': True,
-            'settings': settings.to_dict()
+            'settings': settings_cache.get(game.id).data
         })
         
     except Exception as e:
@@ -38,33 +42,50 @@ def update_game_settings():
         if secret_code != 'MODERATOR2025':
             return jsonify({'error': 'Hibás moderátor kód'}), 403
         
-        game = Game.query.filter_by(is_active=True).first()
+        game = active_games.resolve()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
+        # Számértékű mezők: hibás érték 400, nem 500
+        try:
+            numbers = {field: int(data[field]) for field in INTEGER_SETTINGS if field in data}
+        except (TypeError, ValueError):
+            return jsonify({'error': 'A szavazási idő, a várakozási idő és a számtartomány egész szám kell legyen'}), 400
+        
         settings = get_or_create_game_settings(game.id)
         
         # Beállítások frissítése
-        if 'voting_duration_seconds' in data:
-            duration = int(data['voting_duration_seconds'])
+        if 'voting_duration_seconds' in numbers:
+            duration = numbers['voting_duration_seconds']
             if 10 <= duration <= 60:  # 10-60 mp között
                 settings.voting_duration_seconds = duration
         
         if 'is_sprint_mode' in data:
             settings.is_sprint_mode = bool(data['is_sprint_mode'])
         
+        if 'early_close_enabled' in data:
+            settings.early_close_enabled = bool(data['early_close_enabled'])
+        
+        if 'early_close_settle_seconds' in numbers:
+            settle_seconds = numbers['early_close_settle_seconds']
+            if 0 <= settle_seconds <= 10:  # 0-10 mp között
+                settings.early_close_settle_seconds = settle_seconds
+        
         if 'protection_enabled' in data:
             settings.protection_enabled = bool(data['protection_enabled'])
         
         if 'rescue_round_enabled' in data:
             settings.rescue_round_enabled = bool(data['rescue_round_enabled'])
         
-        if 'number_range_max' in data:
-            max_num = int(data['number_range_max'])
+        if 'number_range_max' in numbers:
+            max_num = numbers['number_range_max']
             if 15 <= max_num <= 50:  # 1-15 és 1-50 között
                 settings.number_range_max = max_num
         
         db.session.commit()
+        settings_cache.invalidate(game.id)
+        # Futó kör határideje az új szavazási idővel
+        round_timer.refresh(game.id)
         
         return jsonify({
             'success': True,
@@ -85,15 +106,17 @@ def get_preset_configurations():
             'description': '20 mp szavazás, védettség be, mentőkör be, 1-20 számok',
             'voting_duration_seconds': 20,
             'is_sprint_mode': False,
+            'early_close_enabled': False,
             'protection_enabled': True,
             'rescue_round_enabled': True,
             'number_range_max': 20
         },
         'sprint': {
             'name': 'Sprint Mód',
-            'description': '15 mp szavazás, védettség ki, mentőkör ki, 1-25 számok',
+            'description': '15 mp szavazás, korai zárás, védettség ki, mentőkör ki, 1-25 számok',
             'voting_duration_seconds': 20,
             'is_sprint_mode': True,  # 15 mp
+            'early_close_enabled': True,
             'protection_enabled': False,
             'rescue_round_enabled': False,
             'number_range_max': 25
@@ -103,6 +126,7 @@ def get_preset_configurations():
             'description': '20 mp szavazás, védettség ki, mentőkör be, 1-25 számok',
             'voting_duration_seconds': 20,
             'is_sprint_mode': False,
+            'early_close_enabled': False,
             'protection_enabled': False,
             'rescue_round_enabled': True,
             'number_range_max': 25
@@ -112,6 +136,7 @@ def get_preset_configurations():
             'description': '25 mp szavazás, védettség be, mentőkör be, 1-20 számok',
             'voting_duration_seconds': 25,
             'is_sprint_mode': False,
+            'early_close_enabled': False,
             'protection_enabled': True,
             'rescue_round_enabled': True,
             'number_range_max': 20
@@ -143,6 +168,7 @@ def apply_preset_configuration():
             'normal': {
                 'voting_duration_seconds': 20,
                 'is_sprint_mode': False,
+                'early_close_enabled': False,
                 'protection_enabled': True,
                 'rescue_round_enabled': True,
                 'number_range_max': 20
@@ -150,6 +176,7 @@ def apply_preset_configuration():
             'sprint': {
                 'voting_duration_seconds': 20,
                 'is_sprint_mode': True,
+                'early_close_enabled': True,
                 'protection_enabled': False,
                 'rescue_round_enabled': False,
                 'number_range_max': 25
@@ -157,6 +184,7 @@ def apply_preset_configuration():
             'fast': {
                 'voting_duration_seconds': 20,
                 'is_sprint_mode': False,
+                'early_close_enabled': False,
                 'protection_enabled': False,
                 'rescue_round_enabled': True,
                 'number_range_max': 25
@@ -164,6 +192,7 @@ def apply_preset_configuration():
             'casual': {
                 'voting_duration_seconds': 25,
                 'is_sprint_mode': False,
+                'early_close_enabled': False,
                 'protection_enabled': True,
                 'rescue_round_enabled': True,
                 'number_range_max': 20
@@ -173,7 +202,7 @@ def apply_preset_configuration():
         if preset_name not in presets:
             return jsonify({'error': 'Ismeretlen preset'}), 400
         
-        game = Game.query.filter_by(is_active=True).first()
+        game = active_games.resolve()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
@@ -185,6 +214,9 @@ def apply_preset_configuration():
             setattr(settings, key, value)
         
         db.session.commit()
+        settings_cache.invalidate(game.id)
+        # Futó kör határideje az új szavazási idővel
+        round_timer.refresh(game.id)
         
         return jsonify({
             'success': True,
@@ -2,31 +2,106 @@
 Szurkolói token API végpontok
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from src.models.user import db
 from src.models.game import Game, Team, Player, Round
 from src.models.supporter import SupporterToken, ModeratorAction
+from src.services.active_game import get_active_game
+from src.services.state_cache import state_cache
+from sqlalchemy import and_, func, update
+import hashlib
 import uuid
 import json
+from datetime import datetime
 
 supporter_bp = Blueprint('supporter', __name__)
 
+TOKENS_PER_PAGE = 100
+MAX_TOKENS_PER_PAGE = 500
+
+def conditional_json(payload):
+    """JSON válasz tartalom alapú ETag-gel (változatlan tartalomra 304)"""
+    body = current_app.json.dumps(payload)
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(hashlib.blake2b(body.encode('utf-8'), digest_size=10).hexdigest())
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 @supporter_bp.route('/supporter/tokens', methods=['GET'])
 def get_supporter_tokens():
-    """Aktív szurkolói tokenek lekérése"""
+    """Aktív szurkolói tokenek tömör, lapozott listája
+
+    Csak azonosítók és a tipp; a csapatnevek a /supporter/teams
+    könyvtárból jönnek. Paraméterek: round (kör szűrés), page (1-től),
+    per_page (legfeljebb MAX_TOKENS_PER_PAGE).
+    """
     try:
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
-        tokens = SupporterToken.query.filter_by(
-            game_id=game.id,
-            is_active=True
-        ).all()
+        # Hibás érték 400 (request.args.get(type=int) csendben az alapértéket adná)
+        try:
+            round_number = int(request.args['round']) if 'round' in request.args else None
+            page = int(request.args.get('page', 1))
+            per_page = int(request.args.get('per_page', TOKENS_PER_PAGE))
+        except ValueError:
+            return jsonify({'error': 'A round, page és per_page egész szám kell legyen'}), 400
+        if page < 1 or not 1 <= per_page <= MAX_TOKENS_PER_PAGE:
+            return jsonify({'error': f'page legalább 1, per_page 1 és {MAX_TOKENS_PER_PAGE} között lehet'}), 400
+        
+        filters = [SupporterToken.game_id == game.id, SupporterToken.is_active == True]
+        if round_number is not None:
+            filters.append(SupporterToken.round_number == round_number)
+        
+        total = db.session.query(func.count(SupporterToken.id)).filter(*filters).scalar()
+        rows = db.session.query(
+            SupporterToken.id,
+            SupporterToken.player_id,
+            SupporterToken.round_number,
+            SupporterToken.predicted_team_id,
+            SupporterToken.predicted_number,
+            SupporterToken.is_prediction_correct
+        ).filter(*filters).order_by(SupporterToken.id).limit(per_page).offset((page - 1) * per_page).all()
+        
+        return conditional_json({
+            'tokens': [row._asdict() for row in rows],
+            'game': {
+                'id': game.id,
+                'state': game.state,
+                'current_round': game.current_round
+            },
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'has_more': page * per_page < total
+        })
         
-        return jsonify({
-            'tokens': [token.to_dict() for token in tokens],
-            'game': game.to_dict()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@supporter_bp.route('/supporter/teams', methods=['GET'])
+def get_team_directory():
+    """Az aktív játék csapatainak könyvtára (id, név, létszám) a tokenek feloldásához
+
+    Tagok nélkül, ETag-gel: a szurkolói képernyők csak változáskor töltik le újra.
+    """
+    try:
+        game = get_active_game()
+        if not game:
+            return jsonify({'error': 'Nincs aktív játék'}), 404
+        
+        teams = db.session.query(
+            Team.id,
+            Team.name,
+            Team.is_active,
+            Team.member_count,
+            Team.score
+        ).filter(Team.game_id == game.id).order_by(Team.id).all()
+        
+        return conditional_json({
+            'game_id': game.id,
+            'teams': [team._asdict() for team in teams]
         })
         
     except Exception as e:
@@ -45,7 +120,7 @@ def submit_prediction():
             return jsonify({'error': 'Hiányzó adatok'}), 400
         
         # Aktív játék ellenőrzése
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
@@ -98,40 +173,62 @@ def evaluate_predictions():
             return jsonify({'error': 'Hiányzó adatok'}), 400
         
         # Aktív játék ellenőrzése
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
-        # Aktuális kör tokenjeinek kiértékelése
-        tokens = SupporterToken.query.filter_by(
-            game_id=game.id,
-            round_number=game.current_round,
-            is_active=True
+        # Aktuális kör tokenjeinek kiértékelése két halmazalapú UPDATE-tel
+        # (a szurkolók számától függetlenül állandó számú utasítás)
+        token_table = SupporterToken.__table__
+        round_tokens = and_(
+            token_table.c.game_id == game.id,
+            token_table.c.round_number == game.current_round,
+            token_table.c.is_active == True
+        )
+        is_winner = and_(
+            token_table.c.predicted_team_id == int(winning_team_id),
+            token_table.c.predicted_number == int(winning_number)
+        )
+        now = datetime.utcnow()
+        
+        winners = db.session.execute(
+            update(token_table).where(round_tokens, is_winner).values(
+                is_prediction_correct=True,
+                used_at=now,
+                is_active=False  # Token felhasználva
+            ).returning(token_table.c.id, token_table.c.player_id)
         ).all()
-        
-        correct_predictions = []
-        
-        for token in tokens:
-            if (token.predicted_team_id == winning_team_id and 
-                token.predicted_number == winning_number):
-                
-                token.is_prediction_correct = True
-                token.used_at = db.datetime.utcnow()
-                correct_predictions.append(token)
-            else:
-                token.is_prediction_correct = False
-            
-            token.is_active = False  # Token felhasználva
+        losers = db.session.execute(
+            update(token_table).where(round_tokens).values(
+                is_prediction_correct=False,
+                is_active=False
+            )
+        ).rowcount
+        
+        # Nyertesek könnyű vetülete (beágyazott játékos és csapat nélkül)
+        players = {row.id: row for row in db.session.query(Player.id, Player.name, Player.nickname).filter(
+            Player.id.in_({player_id for _, player_id in winners})
+        )} if winners else {}
         
         db.session.commit()
+        # A tömeges módosítást a session események nem látják
+        state_cache.bump({game.id}, changed_tables={'supporter_tokens'})
         
         return jsonify({
             'success': True,
-            'correct_predictions': len(correct_predictions),
-            'total_predictions': len(tokens),
-            'winners': [token.to_dict() for token in correct_predictions]
+            'correct_predictions': len(winners),
+            'total_predictions': len(winners) + losers,
+            'winners': [{
+                'token_id': token_id,
+                'player_id': player_id,
+                'player_name': players[player_id].name,
+                'player_nickname': players[player_id].nickname
+            } for token_id, player_id in sorted(winners)]
         })
         
+    except (TypeError, ValueError):
+        db.session.rollback()
+        return jsonify({'error': 'A nyertes csapat és szám egész szám kell legyen'}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -172,30 +269,26 @@ def rejoin_game():
         if not smallest_team:
             return jsonify({'error': 'Nincs elérhető csapat'}), 404
         
-        # Játékos hozzáadása a legkisebb csapathoz
+        # Játékos hozzáadása a legkisebb csapathoz (a tagszámokat a flush frissíti)
         old_team_id = player.team_id
         player.team_id = smallest_team.id
         player.is_active = True
+        db.session.flush()
         
-        # Csapat tagszámok frissítése
-        smallest_team.member_count += 1
-        
-        # Ha a játékos korábban másik csapatban volt, csökkentjük annak tagszámát
+        # Ha a játékos korábbi csapata üres maradt, inaktiváljuk
         if old_team_id and old_team_id != smallest_team.id:
             old_team = Team.query.get(old_team_id)
-            if old_team:
-                old_team.member_count = max(0, old_team.member_count - 1)
-                if old_team.member_count <= 0:
-                    old_team.is_active = False
+            if old_team and old_team.member_count <= 0:
+                old_team.is_active = False
         
         # Token felhasználás jelölése
-        token.used_at = db.datetime.utcnow()
+        token.used_at = datetime.utcnow()
         
         # Moderátor akció rögzítése
         action = ModeratorAction(
             game_id=game.id,
             action_type='supporter_rejoin',
-            description=f'{player.name} visszatért a {smallest_team.name} csapatba szurkolói tokennel'
+            action_data=json.dumps({'player_id': player.id, 'team_id': smallest_team.id, 'token_id': token.id})
         )
         db.session.add(action)
         
@@ -216,7 +309,7 @@ def rejoin_game():
 def generate_moderator_secret():
     """Moderátor titkos kód generálása"""
     try:
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
@@ -246,7 +339,7 @@ def verify_moderator():
         if not secret:
             return jsonify({'error': 'Titkos kód hiányzik'}), 400
         
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
@@ -270,7 +363,7 @@ def toggle_game_pause():
         secret = data.get('secret')
         
         # Moderátor ellenőrzés
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game or game.moderator_secret != secret:
             return jsonify({'error': 'Nincs moderátor jogosultság'}), 403
         
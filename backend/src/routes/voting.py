@@ -4,13 +4,38 @@
 
 from flask import Blueprint, request, jsonify
 from src.models.user import db
-from src.models.game import Game, Team, Player, Round, Vote
-from src.models.game_settings import GameSettings, get_or_create_game_settings
+from src.models.game import Game, Team, Player, Round, Vote, latest_votes_by_player
+from src.services.active_game import get_active_game
+from src.services.lun_engine import round_engines
+from src.services.round_clock import wall_time_ms
+from src.services.round_timer import finalize_round, round_timer, stored_round_result, voting_timing
+from src.services import metrics
+from src.services.settings_cache import settings_cache
+from src.services.vote_buffer import vote_buffer
 from datetime import datetime, timedelta
 import json
+import time
 
 voting_bp = Blueprint('voting', __name__)
 
+@voting_bp.route('/time', methods=['GET'])
+def get_server_time():
+    """Óra szinkronizálás (NTP-szerű): a kliens a t0 küldési idejét adja meg
+
+    Eltolás = ((received_at - t0) + (sent_at - t3)) / 2, körbejárási idő =
+    (t3 - t0) - (sent_at - received_at), ahol t3 a válasz érkezése a kliensen.
+    Adatbázist nem érint; több mérésből a legkisebb körbejárásút érdemes venni.
+    """
+    received_at = wall_time_ms()
+    client_time = request.args.get('t0', type=int)
+    response = jsonify({
+        't0': client_time,
+        'received_at': received_at,
+        'sent_at': wall_time_ms()
+    })
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 @voting_bp.route('/vote/submit', methods=['POST'])
 def submit_vote():
     """Egyéni szavazat leadása vagy módosítása"""
@@ -27,13 +52,18 @@ def submit_vote():
         if not player or not player.is_active:
             return jsonify({'error': 'Játékos nem található vagy inaktív'}), 404
         
+        # Csapat nélkül (késői érkező, kimaradt a párosításból) nincs hova számítani a szavazatot
+        if player.team_id is None:
+            return jsonify({'error': 'Csak csapattag szavazhat'}), 400
+        
         # Aktív játék és beállítások
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
-        settings = get_or_create_game_settings(game.id)
-        min_num, max_num = settings.get_number_range()
+        # Gyorsítótárból: a szavazás nem kérdezi le és nem is hozza létre a beállításokat
+        settings = settings_cache.get(game.id)
+        min_num, max_num = settings.number_range
         
         if not (min_num <= int(number) <= max_num):
             return jsonify({'error': f'A szám {min_num} és {max_num} között kell legyen'}), 400
@@ -47,36 +77,33 @@ def submit_vote():
         if not current_round:
             return jsonify({'error': 'Nincs aktív szavazási kör'}), 404
         
-        # Szavazási idő ellenőrzése (dinamikus időtartam)
-        voting_duration = settings.get_voting_duration()
-        elapsed = (datetime.utcnow() - current_round.voting_start_time).total_seconds()
-        grace_period = 0.3
+        # Egy (akár másik worker által indított) lezárás már folyamatban
+        if current_round.voting_end_time is not None:
+            return jsonify({'error': 'Szavazási idő lejárt'}), 400
         
-        if elapsed > (voting_duration + grace_period):
+        # Szavazási idő ellenőrzése (dinamikus időtartam, monoton órán - a rendszeróra állítása nem számít)
+        voting_duration = settings.voting_duration
+        if time.monotonic() > round_timer.deadline_for(current_round, voting_duration):
             return jsonify({'error': 'Szavazási idő lejárt'}), 400
         
-        # Meglévő szavazat keresése
-        existing_vote = Vote.query.filter_by(
-            player_id=player_id,
-            round_id=current_round.id
-        ).first()
+        voted_at = datetime.utcnow()
+        engine = round_engines.get(current_round)
+        vote_changed = engine.has_vote(player.id)
         
-        if existing_vote:
-            existing_vote.number = int(number)
-            existing_vote.updated_at = datetime.utcnow()
-        else:
-            new_vote = Vote(
-                player_id=player_id,
-                team_id=player.team_id,
-                round_id=current_round.id,
-                number=int(number)
-            )
-            db.session.add(new_vote)
+        # Pufferbe kerül, az író szál kötegben menti (nincs commit kérésenként)
+        if not vote_buffer.submit(game.id, current_round.id, player.id, player.team_id, int(number), voted_at):
+            return jsonify({'error': 'Szavazási idő lejárt'}), 400
+        metrics.record_vote(changed=vote_changed)
         
-        db.session.commit()
+        # Élő LUN motor frissítése (a lezáráskor nem kell újraszámolni)
+        engine.record_vote(player.id, int(number), voted_at)
+        
+        # Mindenki szavazott: a kör a rövid várakozási idő után lezárul
+        if settings.early_close_enabled and engine.all_members_voted():
+            round_timer.close_early(current_round, settings.early_close_settle_seconds)
         
         # Csapat jelenlegi állapotának lekérése
-        team_status = get_team_voting_status(player.team_id, current_round.id, settings)
+        team_status = get_team_voting_status(player.team_id, current_round.id)
         
         return jsonify({
             'success': True,
@@ -89,8 +116,8 @@ def submit_vote():
             'team_status': team_status,
             'settings': {
                 'voting_duration': voting_duration,
-                'number_range': settings.get_number_range(),
-                'time_remaining': max(0, voting_duration - elapsed)
+                'number_range': settings.number_range,
+                **voting_timing(current_round, voting_duration)
             }
         })
         
@@ -103,7 +130,7 @@ def get_team_vote_status(team_id):
     """Csapat szavazási állapotának lekérése"""
     try:
         # Aktív kör keresése
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
@@ -123,9 +150,7 @@ def get_team_vote_status(team_id):
             'team_status': team_status,
             'round_info': {
                 'round_number': current_round.round_number,
-                'is_voting_active': current_round.is_voting_active(),
-                'time_remaining': max(0, current_round.voting_duration_seconds - 
-                                    (datetime.utcnow() - current_round.voting_start_time).total_seconds())
+                **voting_timing(current_round, settings_cache.get(game.id).voting_duration)
             }
         })
         
@@ -137,7 +162,7 @@ def get_round_voting_status():
     """Teljes kör szavazási állapotának lekérése"""
     try:
         # Aktív kör keresése
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
@@ -150,22 +175,24 @@ def get_round_voting_status():
         if not current_round:
             return jsonify({'error': 'Nincs aktív szavazási kör'}), 404
         
-        # Minden csapat állapota
+        # Minden csapat állapota (a kör szavazatai egyetlen lekérdezéssel)
         all_teams_status = {}
-        active_teams = Team.query.filter_by(is_active=True).all()
-        
-        for team in active_teams:
-            all_teams_status[team.id] = get_team_voting_status(team.id, current_round.id)
+        latest_votes = vote_buffer.overlay(
+            current_round.id,
+            latest_votes_by_player(Vote.query.filter_by(round_id=current_round.id).all())
+        )
+        
+        for team in game.get_active_teams():
+            all_teams_status[team.id] = get_team_voting_status(
+                team.id, current_round.id, team=team, latest_votes=latest_votes
+            )
         
         return jsonify({
             'success': True,
             'round_info': {
                 'round_number': current_round.round_number,
-                'is_voting_active': current_round.is_voting_active(),
-                'time_remaining': max(0, current_round.voting_duration_seconds - 
-                                    (datetime.utcnow() - current_round.voting_start_time).total_seconds()),
                 'voting_start_time': current_round.voting_start_time.isoformat(),
-                'voting_duration_seconds': current_round.voting_duration_seconds
+                **voting_timing(current_round, settings_cache.get(game.id).voting_duration)
             },
             'teams_status': all_teams_status
         })
@@ -175,10 +202,49 @@ def get_round_voting_status():
 
 @voting_bp.route('/vote/finalize', methods=['POST'])
 def finalize_voting():
-    """Szavazás lezárása és nyertes meghatározása"""
+    """Szavazás lezárása és nyertes meghatározása
+
+    A szerver időzítője magától is lezárja a kört; ha a kört már lezárták,
+    a tárolt eredményt adjuk vissza, így az ismételt hívás ártalmatlan.
+    """
     try:
         # Aktív kör keresése
-        game = Game.query.filter_by(is_active=True).first()
+        game = get_active_game()
+        if not game:
+            return jsonify({'error': 'Nincs aktív játék'}), 404
+        
+        current_round = Round.query.filter_by(
+            game_id=game.id,
+            round_number=game.current_round
+        ).order_by(Round.id.desc()).first()
+        
+        if not current_round:
+            return jsonify({'error': 'Nincs aktív szavazási kör'}), 404
+        
+        if current_round.state == 'voting':
+            try:
+                result = finalize_round(current_round.id)
+            except TimeoutError as e:
+                return jsonify({'error': str(e)}), 503
+            if result:
+                return jsonify(result)
+            # Közben az időzítő vagy másik kérés lezárta
+            current_round = db.session.get(Round, current_round.id, populate_existing=True)
+        
+        if current_round.state == 'calculating':
+            return jsonify({'error': 'A kör lezárása folyamatban, próbáld újra'}), 409
+        
+        return jsonify(stored_round_result(current_round))
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@voting_bp.route('/vote/live-winner', methods=['GET'])
+def get_live_winner():
+    """Ki nyerne most? - élő nézet a moderátornak az adatbázis terhelése nélkül"""
+    try:
+        game = get_active_game()
         if not game:
             return jsonify({'error': 'Nincs aktív játék'}), 404
         
@@ -191,78 +257,65 @@ def finalize_voting():
         if not current_round:
             return jsonify({'error': 'Nincs aktív szavazási kör'}), 404
         
-        # Szavazás lezárása
-        current_round.voting_end_time = datetime.utcnow()
-        current_round.state = 'calculating'
-        
-        # Nyertes kiszámítása
-        winner_team_id, winning_number, winner_data = current_round.calculate_winner()
-        
-        if winner_team_id:
-            current_round.winner_team_id = winner_team_id
-            current_round.state = 'quiz'
-            
-            # Kvízkérdés kiválasztása
-            from src.models.game import QuizQuestion
-            quiz_question = QuizQuestion.query.filter_by(is_active=True).first()
-            if quiz_question:
-                current_round.quiz_question = quiz_question.question
-                current_round.quiz_answer = quiz_question.answer
-        else:
-            # Döntetlen - mindenki iszik
-            current_round.state = 'completed'
-        
-        db.session.commit()
-        
-        # Eredmény visszaadása
-        team_votes = current_round.get_team_final_votes()
+        engine = round_engines.get(current_round)
+        team_votes = engine.team_votes()
+        winner_team_id, winning_number = engine.current_winner()
         
         return jsonify({
             'success': True,
+            'round_number': current_round.round_number,
             'winner_team_id': winner_team_id,
             'winning_number': winning_number,
-            'winner_data': winner_data,
-            'team_votes': team_votes,
+            'winner_data': team_votes.get(winner_team_id),
             'is_tie': winner_team_id is None,
-            'message': f'Nyertes: {winner_data["team_name"]} ({winning_number})' if winner_team_id else 'Döntetlen - mindenki iszik! 🍻'
+            'number_distribution': engine.number_distribution(),
+            'votes_count': engine.vote_count
         })
         
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-def get_team_voting_status(team_id, round_id):
-    """Csapat szavazási állapotának részletes lekérése"""
-    team = Team.query.get(team_id)
+def get_team_voting_status(team_id, round_id, team=None, latest_votes=None):
+    """Csapat szavazási állapotának részletes lekérése
+
+    A már betöltött csapat és a kör játékosonkénti utolsó szavazatai átadhatók,
+    így több csapat lekérdezésekor nem kell tagonként újra lekérdezni.
+    """
+    if team is None:
+        team = Team.query.get(team_id)
     if not team:
         return None
     
+    active_members = [member for member in team.players if member.is_active]
+    
+    if latest_votes is None:
+        latest_votes = vote_buffer.overlay(round_id, latest_votes_by_player(Vote.query.filter(
+            Vote.round_id == round_id,
+            Vote.player_id.in_([member.id for member in active_members])
+        ).all()))
+    
     # Csapat tagjainak szavazatai
     member_votes = []
     votes_numbers = []
     
-    for member in team.members:
-        if member.is_active:
-            last_vote = Vote.query.filter_by(
-                player_id=member.id,
-                round_id=round_id
-            ).order_by(Vote.updated_at.desc()).first()
-            
-            if last_vote:
-                member_votes.append({
-                    'player_id': member.id,
-                    'player_name': member.name,
-                    'number': last_vote.number,
-                    'voted_at': last_vote.updated_at.isoformat()
-                })
-                votes_numbers.append(last_vote.number)
-            else:
-                member_votes.append({
-                    'player_id': member.id,
-                    'player_name': member.name,
-                    'number': None,
-                    'voted_at': None
-                })
+    for member in active_members:
+        last_vote = latest_votes.get(member.id)
+        
+        if last_vote:
+            member_votes.append({
+                'player_id': member.id,
+                'player_name': member.name,
+                'number': last_vote.number,
+                'voted_at': last_vote.updated_at.isoformat()
+            })
+            votes_numbers.append(last_vote.number)
+        else:
+            member_votes.append({
+                'player_id': member.id,
+                'player_name': member.name,
+                'number': None,
+                'voted_at': None
+            })
     
     # Egyhangúság és legkisebb szám ellenőrzése
     is_unanimous = len(set(votes_numbers)) == 1 if votes_numbers else False
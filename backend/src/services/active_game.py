@@ -0,0 +1,102 @@
+"""
+Aktív játék feloldása folyamatszintű gyorsítótárral
+"""
+
+import threading
+from collections import namedtuple
+
+from .generation_marker import GenerationMarker, marker_path_for
+
+# Az aktív játék változatlan adatai - ezekhez nem kell lekérdezés
+ActiveGame = namedtuple('ActiveGame', ['id', 'name', 'created_at'])
+
+_UNKNOWN = object()
+
+class ActiveGameResolver:
+    """Az aktív játék azonosítója lekérdezés nélkül
+
+    Folyamaton belül explicit invalidate() hívás érvényteleníti (reset, új játék),
+    más worker folyamatok változását a közös jelzőfájl mutatja.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._marker = GenerationMarker()
+        self._cached = _UNKNOWN
+        self._seen_stamp = None
+        self._generation = 0
+
+    def configure(self, database_path):
+        self._marker.configure(marker_path_for(database_path, 'active'))
+
+    def resolve(self):
+        """Aktív játék (ActiveGame) vagy None, ha nincs aktív játék"""
+        stamp = self._marker.stamp()
+        generation = self._generation
+        cached = self._cached
+        if cached is not _UNKNOWN and stamp == self._seen_stamp:
+            return cached
+
+        from src.models.game import Game
+
+        row = Game.query.with_entities(Game.id, Game.name, Game.created_at).filter_by(
+            is_active=True
+        ).first()
+        resolved = ActiveGame(*row) if row else None
+
+        with self._lock:
+            # Ha lekérdezés közben érvénytelenítették, nem írjuk felül a friss állapotot
+            if generation == self._generation:
+                self._cached = resolved
+                self._seen_stamp = stamp
+        return resolved
+
+    def invalidate(self):
+        """Az aktív játék megváltozott (commit után hívandó)"""
+        with self._lock:
+            self._generation += 1
+            self._cached = _UNKNOWN
+            self._seen_stamp = self._marker.touch()
+
+active_games = ActiveGameResolver()
+
+def get_active_game():
+    """Az aktív játék ORM objektuma elsődleges kulcs alapján (táblabejárás nélkül)"""
+    from src.models.game import Game
+    from src.models.user import db
+
+    active = active_games.resolve()
+    if not active:
+        return None
+
+    game = db.session.get(Game, active.id)
+    if game is None or not game.is_active:
+        # Más úton inaktiválták: újrafeloldás
+        active_games.invalidate()
+        active = active_games.resolve()
+        return db.session.get(Game, active.id) if active else None
+    return game
+
+def get_or_create_active_game():
+    """Aktív játék; ha nincs, új játék beállításokkal együtt (commitolva)"""
+    from src.models.game import Game
+    from src.models.game_settings import GameSettings
+    from src.models.user import db
+
+    game = get_active_game()
+    if game:
+        return game
+
+    game = Game(name="Esküvői Kvíz", state="registration")
+    db.session.add(game)
+    db.session.flush()
+    # Beállítások már a játékkal együtt, hogy szavazáskor ne kelljen létrehozni
+    db.session.add(GameSettings(game_id=game.id))
+    db.session.commit()
+    active_games.invalidate()
+    return game
+
+def init_active_game(app, db):
+    """Jelzőfájl beállítása az alkalmazás adatbázisa mellé"""
+    with app.app_context():
+        active_games.configure(db.engine.url.database)
@@ -0,0 +1,168 @@
+"""
+Automatikus csapatbeosztás a párválasztás fázisban - egyetlen tranzakcióban
+"""
+
+import random
+from collections import defaultdict, namedtuple
+
+from sqlalchemy import bindparam, insert, update
+
+from .name_allocator import name_allocator
+from .state_cache import state_cache
+
+MIN_TEAM_SIZE = 2
+MAX_TEAM_SIZE = 6
+PLAN_ATTEMPTS = 20  # Megkötések miatt elakadt beosztásnál ennyiszer próbálunk más sorrendet
+
+PairedTeam = namedtuple('PairedTeam', ['id', 'name', 'member_ids'])
+
+class AutoPairError(ValueError):
+    """A beosztás nem készíthető el (hibás paraméter vagy teljesíthetetlen megkötés)"""
+
+class PairingConflict(RuntimeError):
+    """Beosztás közben valaki már csapatba került (pl. kézi párosítás)"""
+
+def team_capacities(player_count, team_size):
+    """Csapatlétszámok: team_size vagy eggyel több, hogy senki ne maradjon ki"""
+    team_count = max(1, player_count // team_size)
+    base, extra = divmod(player_count, team_count)
+    return [base + 1] * extra + [base] * (team_count - extra)
+
+def plan_teams(player_ids, team_size=2, keep_together=(), keep_apart=(), seed=None):
+    """Csapatbeosztás terve: játékos azonosítók listáinak listája
+
+    A keep_together csoportok tagjai egy csapatba, a keep_apart párok
+    külön csapatba kerülnek. Mohó elhelyezés a legnagyobb egységekkel
+    kezdve, mindig a legtöbb szabad hellyel rendelkező ütközésmentes
+    csapatba (a szabad hely szerinti vödrökből, jellemzően O(1) lépésben).
+    """
+    if not MIN_TEAM_SIZE <= team_size <= MAX_TEAM_SIZE:
+        raise AutoPairError(f'A csapatlétszám {MIN_TEAM_SIZE} és {MAX_TEAM_SIZE} között lehet')
+
+    player_ids = list(player_ids)
+    if len(player_ids) < 2:
+        raise AutoPairError('Legalább két párosítatlan játékos szükséges')
+
+    # Együtt tartandó játékosok egységekké vonása (union-find)
+    parent = {player_id: player_id for player_id in player_ids}
+
+    def find(player_id):
+        if player_id not in parent:
+            raise AutoPairError(f'A {player_id} azonosítójú játékos nem párosítatlan aktív játékos')
+        while parent[player_id] != player_id:
+            parent[player_id] = parent[parent[player_id]]
+            player_id = parent[player_id]
+        return player_id
+
+    for group in keep_together:
+        roots = [find(player_id) for player_id in group]
+        for root in roots[1:]:
+            parent[find(root)] = find(roots[0])
+
+    members = defaultdict(list)
+    for player_id in player_ids:
+        members[find(player_id)].append(player_id)
+
+    conflicts = defaultdict(set)
+    for first, second in keep_apart:
+        first_unit, second_unit = find(first), find(second)
+        if first_unit == second_unit:
+            raise AutoPairError(f'{first} és {second} egyszerre együtt tartandó és szétválasztandó')
+        conflicts[first_unit].add(second_unit)
+        conflicts[second_unit].add(first_unit)
+
+    capacities = team_capacities(len(player_ids), team_size)
+    largest_unit = max(len(unit) for unit in members.values())
+    if largest_unit > max(capacities):
+        raise AutoPairError(f'Egy együtt tartandó csoport ({largest_unit} fő) nagyobb a csapatlétszámnál')
+
+    rng = random.Random(seed)
+    for _ in range(PLAN_ATTEMPTS):
+        plan = _place_units(members, conflicts, capacities, rng)
+        if plan is not None:
+            return plan
+    raise AutoPairError('A megkötésekkel nem sikerült beosztani a játékosokat')
+
+def _place_units(members, conflicts, capacities, rng):
+    units = list(members)
+    rng.shuffle(units)
+    # Nagy és sok ütközésű egységek előbb (azonos méretnél a keverés dönt)
+    units.sort(key=lambda unit: (len(members[unit]), len(conflicts[unit])), reverse=True)
+
+    teams = [[] for _ in capacities]
+    team_units = [set() for _ in capacities]
+    buckets = defaultdict(list)  # szabad helyek száma -> csapat indexek
+    for index, capacity in enumerate(capacities):
+        buckets[capacity].append(index)
+    max_capacity = max(capacities)
+
+    for unit in units:
+        size = len(members[unit])
+        unit_conflicts = conflicts[unit]
+        placed = False
+        for free in range(max_capacity, size - 1, -1):
+            bucket = buckets[free]
+            for position in range(len(bucket) - 1, -1, -1):
+                index = bucket[position]
+                if unit_conflicts and not unit_conflicts.isdisjoint(team_units[index]):
+                    continue
+                bucket[position] = bucket[-1]
+                bucket.pop()
+                teams[index].extend(members[unit])
+                team_units[index].add(unit)
+                buckets[free - size].append(index)
+                placed = True
+                break
+            if placed:
+                break
+        if not placed:
+            return None
+    return teams
+
+def auto_pair(game, team_size=2, keep_together=(), keep_apart=(), seed=None, dry_run=False):
+    """Minden párosítatlan aktív játékos csapatba osztása
+
+    A csapatok és a hozzárendelések egy tranzakcióban jönnek létre; ha
+    közben valaki kézzel csapatba került, semmi sem íródik ki
+    (PairingConflict). dry_run esetén csak a terv készül el, név foglalás és
+    írás nélkül (id és name None).
+    """
+    from src.models.game import Player, Team
+    from src.models.user import db
+
+    player_ids = [player_id for player_id, in db.session.query(Player.id).filter(
+        Player.is_active == True,
+        Player.team_id.is_(None)
+    ).order_by(Player.id)]
+    plan = plan_teams(player_ids, team_size, keep_together, keep_apart, seed)
+    if dry_run:
+        return [PairedTeam(None, None, team_members) for team_members in plan]
+
+    # Csapatok egyetlen többsoros INSERT ... RETURNING utasítással; a RETURNING
+    # sorrendje nem garantált, ezért a (kiosztáskor egyedi) név alapján párosítunk
+    # A Core írást a tagszám események nem látják: a member_count rögtön a végleges érték
+    names = [name_allocator.team_name(game.id) for _ in plan]
+    inserted = dict(db.session.execute(
+        insert(Team).returning(Team.name, Team.id),
+        [{'name': name, 'game_id': game.id, 'member_count': len(team_members)}
+         for name, team_members in zip(names, plan)]
+    ).all())
+    team_ids = [inserted[name] for name in names]
+
+    # Egyetlen executemany; csak a még mindig párosítatlan játékos kerül át
+    player_table = Player.__table__
+    statement = update(player_table).where(
+        player_table.c.id == bindparam('player_id'),
+        player_table.c.team_id.is_(None)
+    ).values(team_id=bindparam('new_team_id'))
+    assignments = [{'player_id': player_id, 'new_team_id': team_id}
+                   for team_id, team_members in zip(team_ids, plan) for player_id in team_members]
+    result = db.session.execute(statement, assignments)
+    if result.rowcount != len(assignments):
+        db.session.rollback()
+        raise PairingConflict('Beosztás közben változtak a csapatok, próbáld újra')
+
+    db.session.commit()
+    # A tömeges módosítást a session események nem látják
+    state_cache.bump({game.id}, changed_tables={'team', 'player'})
+    return [PairedTeam(*team) for team in zip(team_ids, names, plan)]
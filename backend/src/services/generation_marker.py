@@ -0,0 +1,51 @@
+"""
+Fájl alapú generáció jelző - változások észlelése több worker folyamat között
+"""
+
+import os
+import threading
+import time
+
+class GenerationMarker:
+    """Az adatbázis mellé írt jelzőfájl: minden érintés új inode-ot és időbélyeget ad
+
+    Az olvasó oldal egy os.stat hívással (lekérdezés nélkül) észreveszi,
+    ha egy másik folyamat jelzett változást.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+
+    def configure(self, path):
+        self.path = path
+
+    def stamp(self):
+        """A jelzőfájl aktuális állapota (None, ha nincs beállítva vagy még nem létezik)"""
+        if not self.path:
+            return None
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def touch(self):
+        """Változás jelzése; a saját írásunk állapotát adja vissza"""
+        if not self.path:
+            return None
+
+        # Atomikus csere: az olvasók sosem látnak félig írt fájlt
+        # (szálanként külön ideiglenes fájl, különben párhuzamos commitok ütköznek)
+        temp_path = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w') as marker_file:
+            marker_file.write(str(time.time_ns()))
+            marker_file.flush()
+            stat = os.fstat(marker_file.fileno())
+        os.replace(temp_path, self.path)
+        return stat.st_ino, stat.st_mtime_ns
+
+def marker_path_for(database_path, suffix):
+    """Jelzőfájl útvonala az SQLite adatbázis mellett (memóriabeli adatbázisnál None)"""
+    if not database_path or database_path == ':memory:':
+        return None
+    return f'{database_path}-{suffix}'
@@ -0,0 +1,174 @@
+"""
+Vendéglista tömeges előregisztrálása (CSV vagy JSON) kötegelt tranzakciókban
+"""
+
+import csv
+import io
+import itertools
+import json
+import time
+import uuid
+from collections import namedtuple
+
+from sqlalchemy import insert
+
+from .active_game import get_or_create_active_game
+from .name_allocator import name_allocator
+from .state_cache import state_cache
+
+BATCH_SIZE = 500  # Ennyi vendég kerül egy tranzakcióba
+MAX_NAME_LENGTH = 80  # Player.name oszlop hossza
+NAME_COLUMNS = ('name', 'név', 'nev', 'vendég', 'vendeg', 'guest')
+CSV_DELIMITERS = ',;\t'  # a magyar Excel pontosvesszővel ment
+
+ImportResult = namedtuple('ImportResult', [
+    'game_id', 'guests', 'skipped_existing', 'skipped_invalid', 'batches', 'elapsed_ms'
+])
+
+def _detect_format(filename=None, content_type=None):
+    if (filename or '').lower().endswith('.json') or 'json' in (content_type or ''):
+        return 'json'
+    return 'csv'
+
+def read_guest_names(stream, fmt=None, filename=None, content_type=None):
+    """Vendégnevek egyenként a listából (szöveges stream)
+
+    CSV: 'name'/'név' fejlécű oszlop, fejléc nélkül az első oszlop.
+    JSON: nevek vagy {"name": ...} objektumok listája (vagy {"guests": [...]}).
+    """
+    fmt = fmt or _detect_format(filename, content_type)
+    if fmt == 'json':
+        return names_from_json(json.load(stream))
+    if fmt == 'csv':
+        return _read_csv_names(stream)
+    raise ValueError(f'Ismeretlen formátum: {fmt}')
+
+def names_from_json(data):
+    """Nevek már beolvasott JSON adatból"""
+    if isinstance(data, dict):
+        data = data.get('guests')
+    if not isinstance(data, list):
+        raise ValueError('A JSON vendéglista nevek listája legyen')
+    for item in data:
+        yield item.get('name', '') if isinstance(item, dict) else item
+
+def _read_csv_names(stream):
+    first_line = stream.readline()
+    if not first_line:
+        return
+    try:
+        dialect = csv.Sniffer().sniff(first_line, delimiters=CSV_DELIMITERS)
+    except csv.Error:
+        dialect = csv.excel
+
+    # Az első sor visszakerül a folyamba, a többi soronként olvasódik
+    rows = csv.reader(itertools.chain([first_line], stream), dialect)
+    header = next(rows)
+    columns = [cell.strip().lower() for cell in header]
+    name_index = next((columns.index(name) for name in NAME_COLUMNS if name in columns), None)
+    if name_index is None:
+        # Nincs fejléc: az első sor is vendég
+        name_index = 0
+        rows = itertools.chain([header], rows)
+
+    for row in rows:
+        yield row[name_index] if len(row) > name_index else ''
+
+def import_guests(names, batch_size=BATCH_SIZE, skip_existing=True):
+    """Vendégek létrehozása kötegenként egy-egy tranzakcióban
+
+    A már regisztrált (aktív) nevek és a listán belüli ismétlések
+    skip_existing mellett kimaradnak, így az import újrafuttatható.
+    Sikertelen kötegnél a korábbi kötegek megmaradnak.
+    ValueError, ha a kötegméret nem pozitív.
+    """
+    from src.models.game import Player
+    from src.models.user import db
+
+    if batch_size < 1:
+        # 0 vagy negatív méretnél minden sor külön INSERT lenne
+        raise ValueError(f'A kötegméret legalább 1 legyen: {batch_size}')
+
+    started = time.perf_counter()
+    game = get_or_create_active_game()
+
+    # Egy lekérdezés az egész importhoz (nem vendégenként)
+    known_names = set()
+    if skip_existing:
+        known_names = {name for name, in db.session.query(Player.name).filter_by(is_active=True)}
+
+    guests = []
+    skipped_existing = skipped_invalid = batches = 0
+    batch = []
+
+    def write_batch():
+        # Egyetlen többsoros INSERT ... RETURNING; a sorrend nem garantált
+        # (sort_by_parameter_order soronkénti INSERT-et adna), ezért az egyedi session_id alapján párosítunk
+        ids = dict(db.session.execute(
+            insert(Player).returning(Player.session_id, Player.id),
+            batch
+        ).all())
+        db.session.commit()
+        guests.extend({'id': ids[guest['session_id']], **guest} for guest in batch)
+
+    for raw_name in names:
+        name = str(raw_name or '').strip()
+        if not name or len(name) > MAX_NAME_LENGTH:
+            skipped_invalid += 1
+            continue
+        if skip_existing:
+            if name in known_names:
+                skipped_existing += 1
+                continue
+            known_names.add(name)
+
+        batch.append({
+            'name': name,
+            'nickname': name_allocator.nickname(game.id),
+            'session_id': str(uuid.uuid4())
+        })
+        if len(batch) >= batch_size:
+            write_batch()
+            batches += 1
+            batch = []
+
+    if batch:
+        write_batch()
+        batches += 1
+
+    if guests:
+        # A tömeges beszúrást a session események nem látják
+        state_cache.bump({None}, changed_tables={'player'})
+
+    return ImportResult(
+        game.id, guests, skipped_existing, skipped_invalid, batches,
+        round((time.perf_counter() - started) * 1000)
+    )
+
+def join_payload(session_id, base_url=None):
+    """Belépő QR kód tartalma: link a session azonosítóval, vagy maga az azonosító"""
+    if not base_url:
+        return session_id
+    return f'{base_url.rstrip("/")}/?join={session_id}'
+
+def guest_tokens(guests, base_url=None):
+    """Vendégenkénti belépő adatok: név, becenév, token (/api/join) és QR tartalom"""
+    return [{
+        'id': guest['id'],
+        'name': guest['name'],
+        'nickname': guest['nickname'],
+        'token': guest['session_id'],
+        'qr_payload': join_payload(guest['session_id'], base_url)
+    } for guest in guests]
+
+def render_guest_tokens(guests, fmt='csv', base_url=None):
+    """Belépő adatok CSV vagy JSON szövegként (nyomtatáshoz, QR generáláshoz)"""
+    rows = guest_tokens(guests, base_url)
+    if fmt == 'json':
+        return json.dumps(rows, ensure_ascii=False, indent=2)
+
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=['id', 'name', 'nickname', 'token', 'qr_payload'])
+    writer.writeheader()
+    writer.writerows(rows)
+    return output.getvalue()
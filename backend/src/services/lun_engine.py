@@ -0,0 +1,252 @@
+"""
+Legkisebb egyedi szám (LUN) motor - körönként memóriában, szavazatonként frissítve
+"""
+
+import heapq
+import threading
+from collections import Counter, defaultdict
+
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+
+from .state_cache import state_cache
+from .vote_buffer import vote_buffer
+
+FALLBACK_NUMBER = 20  # Aki nem szavazott, annak a száma
+
+def lowest_unique_number(entries):
+    """Legkisebb egyedi szám és gazdája (key, number) párok közül
+
+    Ha nincs egyedi szám, (None, None) a visszatérési érték.
+    """
+    entries = list(entries)
+    counts = Counter(number for _, number in entries)
+    unique_numbers = [number for number, count in counts.items() if count == 1]
+
+    if not unique_numbers:
+        return None, None
+
+    winning_number = min(unique_numbers)
+    for key, number in entries:
+        if number == winning_number:
+            return key, winning_number
+
+class RoundEngine:
+    """Egy szavazási kör élő állapota
+
+    Csapatonként tárolja a tagok aktuális számát és a csapat végső számát
+    (egyhangú szám vagy a legkisebb, nem szavazó tag = 20), számonként a rá
+    szavazó csapatokat, valamint egy kupacot az egyedivé vált számokról.
+    Egy szavazat feldolgozása a csapat méretével arányos, a nyertes
+    lekérdezése amortizáltan O(log n).
+    """
+
+    def __init__(self, round_id):
+        self.round_id = round_id
+        self._lock = threading.Lock()
+        self._team_names = {}
+        self._team_members = {}  # team_id -> aktív tagok (betöltési sorrendben)
+        self._member_team = {}  # player_id -> team_id
+        self._player_votes = {}  # player_id -> szám
+        self._player_updated_at = {}  # player_id -> utolsó módosítás
+        self._team_numbers = {}  # team_id -> Counter(tagok számai)
+        self._team_final = {}  # team_id -> végső szám
+        self._teams_by_number = defaultdict(set)
+        self._unique_heap = []
+        self.vote_count = 0
+        self.voted_member_count = 0  # aktív csapattagok közül ennyien szavaztak
+        self.last_updated_at = None
+
+    def add_team(self, team_id, team_name, member_ids):
+        """Csapat felvétele az aktív tagjaival (kezdetben senki nem szavazott)"""
+        with self._lock:
+            self._team_names[team_id] = team_name
+            self._team_members[team_id] = list(member_ids)
+            self._team_numbers[team_id] = Counter({FALLBACK_NUMBER: len(member_ids)} if member_ids else {})
+            for player_id in member_ids:
+                self._member_team[player_id] = team_id
+            self._set_team_final(team_id, FALLBACK_NUMBER)
+
+    def record_vote(self, player_id, number, updated_at=None):
+        """Szavazat rögzítése vagy módosítása"""
+        with self._lock:
+            # Párhuzamos kéréseknél a régebbi módosítás nem írhatja felül az újabbat
+            known_updated_at = self._player_updated_at.get(player_id)
+            if updated_at and known_updated_at and updated_at < known_updated_at:
+                return
+
+            previous = self._player_votes.get(player_id)
+            if previous is None:
+                self.vote_count += 1
+                if player_id in self._member_team:
+                    self.voted_member_count += 1
+            self._player_votes[player_id] = number
+            if updated_at:
+                self._player_updated_at[player_id] = updated_at
+                if self.last_updated_at is None or updated_at > self.last_updated_at:
+                    self.last_updated_at = updated_at
+
+            team_id = self._member_team.get(player_id)
+            if team_id is None or previous == number:
+                return
+
+            numbers = self._team_numbers[team_id]
+            old_number = FALLBACK_NUMBER if previous is None else previous
+            numbers[old_number] -= 1
+            if numbers[old_number] <= 0:
+                del numbers[old_number]
+            numbers[number] += 1
+
+            self._set_team_final(team_id, min(numbers))
+
+    def membership_fingerprint(self):
+        """Tagság lenyomata: (tagok száma, azonosítók összege, azonosító*csapat összege)"""
+        with self._lock:
+            return (
+                len(self._member_team),
+                sum(self._member_team),
+                sum(player_id * team_id for player_id, team_id in self._member_team.items())
+            )
+
+    def has_vote(self, player_id):
+        return player_id in self._player_votes
+
+    def all_members_voted(self):
+        """Minden aktív csapattag leadta a szavazatát"""
+        with self._lock:
+            return bool(self._member_team) and self.voted_member_count >= len(self._member_team)
+
+    def current_winner(self):
+        """Aktuális nyertes: (team_id, szám) vagy (None, None), ha nincs egyedi szám"""
+        with self._lock:
+            while self._unique_heap:
+                number = self._unique_heap[0]
+                teams = self._teams_by_number.get(number)
+                if teams and len(teams) == 1:
+                    return next(iter(teams)), number
+                heapq.heappop(self._unique_heap)
+            return None, None
+
+    def team_votes(self):
+        """Csapatok végső szavazatai a Round.get_team_final_votes formátumában"""
+        with self._lock:
+            team_votes = {}
+            for team_id, member_ids in self._team_members.items():
+                member_votes = [self._player_votes.get(player_id, FALLBACK_NUMBER) for player_id in member_ids]
+                team_votes[team_id] = {
+                    'final_number': self._team_final[team_id],
+                    'is_unanimous': len(set(member_votes)) == 1,
+                    'member_votes': member_votes,
+                    'team_name': self._team_names[team_id]
+                }
+            return team_votes
+
+    def number_distribution(self):
+        """Számonként hány csapat végső száma (élő moderátori nézethez)"""
+        with self._lock:
+            return {number: len(teams) for number, teams in sorted(self._teams_by_number.items()) if teams}
+
+    def _set_team_final(self, team_id, number):
+        old_number = self._team_final.get(team_id)
+        if old_number == number:
+            return
+        if old_number is not None:
+            teams = self._teams_by_number[old_number]
+            teams.discard(team_id)
+            if len(teams) == 1:
+                heapq.heappush(self._unique_heap, old_number)
+        self._team_final[team_id] = number
+        teams = self._teams_by_number[number]
+        teams.add(team_id)
+        if len(teams) == 1:
+            heapq.heappush(self._unique_heap, number)
+
+class RoundEngineRegistry:
+    """Aktív körök motorjai; adatbázisból épülnek fel, ha még nincsenek meg"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engines = {}
+        self._unchecked = set()  # tagságváltozás után ellenőrizendő körök
+
+    def get(self, round_, verify=False):
+        """Kör motorja; verify=True esetén egy gyors lekérdezéssel ellenőrzi,
+        hogy más folyamat nem rögzített-e közben szavazatot"""
+        with self._lock:
+            engine = self._engines.get(round_.id)
+            membership_check = round_.id in self._unchecked
+            self._unchecked.discard(round_.id)
+
+        if engine and membership_check and not self._matches_membership(engine, round_):
+            engine = None
+        if engine and verify and not self._matches_database(engine):
+            engine = None
+
+        if engine is None:
+            engine = self._build(round_)
+            with self._lock:
+                self._engines[round_.id] = engine
+        return engine
+
+    def record_vote(self, round_, player_id, number, updated_at=None):
+        self.get(round_).record_vote(player_id, number, updated_at)
+
+    def discard(self, round_id):
+        with self._lock:
+            self._engines.pop(round_id, None)
+            self._unchecked.discard(round_id)
+
+    def invalidate(self, changed_tables=None):
+        """Csapat- vagy játékosváltozás (vagy más worker commitja) után a
+        következő lekérés ellenőrzi a tagságot; újraépítés csak tényleges eltérésnél"""
+        if changed_tables is None or {'team', 'player'} & set(changed_tables):
+            with self._lock:
+                self._unchecked.update(self._engines)
+
+    def _build(self, round_):
+        from src.models.game import Team, Vote, latest_votes_by_player
+
+        engine = RoundEngine(round_.id)
+        active_teams = Team.query.options(selectinload(Team.players)).filter_by(
+            game_id=round_.game_id,
+            is_active=True
+        ).populate_existing().all()
+
+        for team in active_teams:
+            engine.add_team(team.id, team.name, [player.id for player in team.players if player.is_active])
+
+        for player_id, vote in latest_votes_by_player(Vote.query.filter_by(round_id=round_.id).all()).items():
+            engine.record_vote(player_id, vote.number, vote.updated_at)
+        # E folyamat még ki nem írt szavazatai (a régebbieket a record_vote eldobja)
+        for player_id, vote in vote_buffer.pending_votes(round_.id).items():
+            engine.record_vote(player_id, vote.number, vote.updated_at)
+        return engine
+
+    def _matches_membership(self, engine, round_):
+        """Egyetlen aggregált lekérdezés: változott-e az aktív csapatok tagsága"""
+        from src.models.game import Player, Team
+        from src.models.user import db
+
+        count, id_sum, pair_sum = db.session.query(
+            func.count(Player.id),
+            func.coalesce(func.sum(Player.id), 0),
+            func.coalesce(func.sum(Player.id * Team.id), 0)
+        ).join(Team, Player.team_id == Team.id).filter(
+            Team.game_id == round_.game_id,
+            Team.is_active == True,
+            Player.is_active == True
+        ).one()
+        return (count, id_sum, pair_sum) == engine.membership_fingerprint()
+
+    def _matches_database(self, engine):
+        from src.models.game import Vote
+        from src.models.user import db
+
+        vote_count, last_updated_at = db.session.query(
+            func.count(func.distinct(Vote.player_id)),
+            func.max(Vote.updated_at)
+        ).filter(Vote.round_id == engine.round_id).one()
+        return vote_count == engine.vote_count and last_updated_at == engine.last_updated_at
+
+round_engines = RoundEngineRegistry()
+state_cache.add_listener(round_engines.invalidate)
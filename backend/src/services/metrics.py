@@ -0,0 +1,299 @@
+"""
+Folyamaton belüli metrikák Prometheus szöveges formátumban (/api/metrics)
+"""
+
+import bisect
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, g, request
+from sqlalchemy import event
+
+# Sávok száma: a szálak azonosító alapján más-más zárat használnak, így a
+# szavazási hullám párhuzamos kérései ritkán várnak egymásra
+STRIPES = 16
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LOCK_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Ennyi ideig számít aktívnak egy állapotot lekérdező kliens, illetve ennyi
+# másodperc átlaga a szavazat/mp érték
+CLIENT_WINDOW_SECONDS = 10
+RATE_WINDOW_SECONDS = 10
+
+def _stripe_index():
+    return threading.get_ident() % STRIPES
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Csak növekvő számláló, sávokra bontott zárakkal"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._locks = [threading.Lock() for _ in range(STRIPES)]
+        self._values = [defaultdict(float) for _ in range(STRIPES)]
+
+    def inc(self, amount=1, *labels):
+        index = _stripe_index()
+        with self._locks[index]:
+            self._values[index][labels] += amount
+
+    def collect(self):
+        totals = defaultdict(float)
+        for lock, values in zip(self._locks, self._values):
+            with lock:
+                for labels, value in values.items():
+                    totals[labels] += value
+        if not totals and not self.labelnames:
+            totals[()] = 0.0
+        return [(f'{self.name}{_format_labels(self.labelnames, labels)}', value)
+                for labels, value in sorted(totals.items())]
+
+class Histogram:
+    """Kumulatív sávos hisztogram (Prometheus histogram típus)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.labelnames = labelnames
+        self._locks = [threading.Lock() for _ in range(STRIPES)]
+        self._values = [{} for _ in range(STRIPES)]
+
+    def observe(self, value, *labels):
+        bucket = bisect.bisect_left(self.buckets, value)
+        index = _stripe_index()
+        with self._locks[index]:
+            series = self._values[index].get(labels)
+            if series is None:
+                # [sávonkénti darabszám..., +Inf, összeg]
+                series = self._values[index][labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bucket] += 1
+            series[-1] += value
+
+    def collect(self):
+        merged = {}
+        for lock, values in zip(self._locks, self._values):
+            with lock:
+                for labels, series in values.items():
+                    total = merged.setdefault(labels, [0] * len(series[:-1]) + [0.0])
+                    for position, value in enumerate(series):
+                        total[position] += value
+
+        samples = []
+        for labels, series in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                samples.append((
+                    f'{self.name}_bucket{_format_labels(self.labelnames, labels, ("le", le))}',
+                    cumulative
+                ))
+            label_text = _format_labels(self.labelnames, labels)
+            samples.append((f'{self.name}_sum{label_text}', series[-1]))
+            samples.append((f'{self.name}_count{label_text}', cumulative))
+        return samples
+
+class Gauge:
+    """Pillanatnyi érték; callback esetén lekérdezéskor számolva"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, callback=None):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def collect(self):
+        value = self.callback() if self.callback else self._value
+        return [] if value is None else [(self.name, value)]
+
+class RateWindow:
+    """Másodpercenkénti darabszám az utolsó néhány másodpercre"""
+
+    def __init__(self, seconds=RATE_WINDOW_SECONDS):
+        self.seconds = seconds
+        self._lock = threading.Lock()
+        self._slots = [0] * (seconds + 1)
+        self._slot_times = [0] * (seconds + 1)
+
+    def add(self, amount=1):
+        now = int(time.time())
+        slot = now % len(self._slots)
+        with self._lock:
+            if self._slot_times[slot] != now:
+                self._slot_times[slot] = now
+                self._slots[slot] = 0
+            self._slots[slot] += amount
+
+    def rate(self):
+        """Átlag az utolsó teljes másodpercekre (a folyamatban lévőt kihagyva)"""
+        now = int(time.time())
+        with self._lock:
+            total = sum(count for count, at in zip(self._slots, self._slot_times)
+                        if now - self.seconds <= at < now)
+        return total / self.seconds
+
+class ClientWindow:
+    """Az utóbbi másodpercekben állapotot lekérdező különböző kliensek
+
+    A kliensek a kulcsuk alapján kerülnek sávba (nem a szál alapján), így egy
+    kliens csak egyszer számít, bármelyik szál szolgálja ki.
+    """
+
+    def __init__(self, seconds=CLIENT_WINDOW_SECONDS):
+        self.seconds = seconds
+        self._locks = [threading.Lock() for _ in range(STRIPES)]
+        self._last_seen = [{} for _ in range(STRIPES)]
+
+    def touch(self, client_key):
+        index = hash(client_key) % STRIPES
+        with self._locks[index]:
+            self._last_seen[index][client_key] = time.monotonic()
+
+    def count(self):
+        cutoff = time.monotonic() - self.seconds
+        total = 0
+        for lock, last_seen in zip(self._locks, self._last_seen):
+            with lock:
+                for client_key, seen in list(last_seen.items()):
+                    if seen < cutoff:
+                        del last_seen[client_key]
+                total += len(last_seen)
+        return total
+
+def current_round_number():
+    """Az aktív játék köre (None, ha nincs aktív játék)"""
+    from src.services.active_game import get_active_game
+
+    game = get_active_game()
+    return game.current_round if game else None
+
+vote_rate = RateWindow()
+poll_clients = ClientWindow()
+
+request_duration = Histogram(
+    'wedding_http_request_duration_seconds', 'Kérések kiszolgálási ideje végpontonként',
+    labelnames=('endpoint', 'method')
+)
+requests_total = Counter(
+    'wedding_http_requests_total', 'Kérések száma végpont és státuszkód szerint',
+    labelnames=('endpoint', 'status')
+)
+votes_total = Counter('wedding_votes_total', 'Leadott szavazatok (új és módosított)')
+vote_changes_total = Counter('wedding_vote_changes_total', 'Módosított szavazatok')
+finalize_duration = Histogram(
+    'wedding_round_finalize_duration_seconds', 'Kör lezárásának ideje (nyertes számítással)'
+)
+sqlite_lock_wait = Histogram(
+    'wedding_sqlite_write_lock_wait_seconds',
+    'Tranzakció első író utasításának ideje (írózár megszerzése + végrehajtás)',
+    buckets=LOCK_WAIT_BUCKETS
+)
+stream_clients = Gauge('wedding_stream_clients', 'Nyitott SSE állapot stream kapcsolatok')
+
+METRICS = [
+    request_duration,
+    requests_total,
+    votes_total,
+    vote_changes_total,
+    Gauge('wedding_votes_per_second', f'Szavazat/mp az utolsó {RATE_WINDOW_SECONDS} mp átlagában',
+          callback=vote_rate.rate),
+    finalize_duration,
+    stream_clients,
+    Gauge('wedding_poll_clients', f'Az utolsó {CLIENT_WINDOW_SECONDS} mp-ben állapotot lekérdező kliensek',
+          callback=poll_clients.count),
+    sqlite_lock_wait,
+    Gauge('wedding_current_round', 'Az aktív játék aktuális köre', callback=current_round_number)
+]
+
+def record_vote(changed):
+    """Szavazat commit után (changed: meglévő szavazat módosítása)"""
+    votes_total.inc()
+    vote_rate.add()
+    if changed:
+        vote_changes_total.inc()
+
+def render_metrics():
+    """Minden metrika Prometheus szöveges formátumban"""
+    lines = []
+    for metric in METRICS:
+        lines.append(f'# HELP {metric.name} {metric.help_text}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(f'{name} {_format_value(value)}' for name, value in metric.collect())
+    return '\n'.join(lines) + '\n'
+
+def init_metrics(app, db):
+    """Kérés- és adatbázis mérések bekötése, /api/metrics végpont (db.init_app után hívandó)"""
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_write_timer(conn, cursor, statement, parameters, context, executemany):
+        if not conn.info.get('metrics_write_locked'):
+            conn.info['metrics_statement_start'] = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def stop_write_timer(conn, cursor, statement, parameters, context, executemany):
+        if conn.info.get('metrics_write_locked') or context is None:
+            return
+        if context.isinsert or context.isupdate or context.isdelete:
+            # Az SQLite az első író utasításnál vár az írózárra (busy_timeout)
+            conn.info['metrics_write_locked'] = True
+            sqlite_lock_wait.observe(time.perf_counter() - conn.info['metrics_statement_start'])
+
+    @event.listens_for(engine, 'commit')
+    @event.listens_for(engine, 'rollback')
+    def release_write_lock(conn):
+        conn.info['metrics_write_locked'] = False
+
+    @app.before_request
+    def start_metrics_timer():
+        g.metrics_started = time.perf_counter()
+        if request.endpoint in ('game.get_game_state', 'game.stream_game_state'):
+            poll_clients.touch((request.remote_addr, request.user_agent.string))
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get('metrics_started')
+        if started is not None:
+            endpoint = request.endpoint or 'unknown'
+            request_duration.observe(time.perf_counter() - started, endpoint, request.method)
+            requests_total.inc(1, endpoint, str(response.status_code))
+        return response
+
+    def get_metrics():
+        """Prometheus scrape végpont"""
+        return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    app.add_url_rule('/api/metrics', 'metrics', get_metrics)
@@ -0,0 +1,196 @@
+"""
+Becenév és csapatnév kiosztás szabad névkészletekből (O(1) kiosztás és visszaadás)
+"""
+
+import random
+import threading
+from collections import Counter
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from .names import TEAM_NAMES, WEDDING_NICKNAMES
+
+class NamePool:
+    """Egy névkészlet: szabad nevek verme és a használt nevek száma
+
+    Elfogyás után sorszámozott változatokat ad determinisztikus sorrendben
+    ("Nászmester 2", "Koszorúslány 2", ..., majd "Nászmester 3"), így egy
+    játékon belül nem ismétlődik név.
+    """
+
+    def __init__(self, base_names, used_names=()):
+        self._base = list(base_names)
+        self._in_use = Counter(used_names)
+        self._free = [name for name in self._base if not self._in_use[name]]
+        random.shuffle(self._free)
+        self._free_set = set(self._free)
+        self._variant_index = 0
+
+    def allocate(self):
+        while self._free:
+            name = self._free.pop()
+            self._free_set.discard(name)
+            # Közben visszatért (újraaktivált) tag is viselheti
+            if not self._in_use[name]:
+                break
+        else:
+            name = self._next_variant()
+        self._in_use[name] += 1
+        return name
+
+    def release(self, name):
+        count = self._in_use[name]
+        if count > 1:
+            self._in_use[name] = count - 1
+        elif count == 1:
+            del self._in_use[name]
+            if name not in self._free_set:
+                self._free.append(name)
+                self._free_set.add(name)
+
+    def mark_used(self, name):
+        """Újraaktivált játékos vagy csapat neve ismét foglalt"""
+        self._in_use[name] += 1
+
+    def _next_variant(self):
+        while True:
+            base = self._base[self._variant_index % len(self._base)]
+            name = f'{base} {self._variant_index // len(self._base) + 2}'
+            self._variant_index += 1
+            if not self._in_use[name]:
+                return name
+
+class NameAllocator:
+    """Játékonkénti becenév- és csapatnév készletek
+
+    A készlet első használatkor egyetlen lekérdezéssel töltődik fel az aktív
+    sorokból. A kiosztott nevet visszaveszi, ha a tranzakció visszagördül;
+    a játékos vagy csapat inaktiválásakor (commit után) a név újra szabad.
+    Másik worker folyamat kiosztását nem látja: ott legfeljebb ismétlődés
+    lehet, ahogy korábban is.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools = {}  # (fajta, game_id) -> NamePool
+
+    def nickname(self, game_id):
+        return self._allocate(('nickname', game_id))
+
+    def team_name(self, game_id):
+        return self._allocate(('team', game_id))
+
+    def reset(self):
+        """Játék újraindítása után minden készlet újratöltődik"""
+        with self._lock:
+            self._pools.clear()
+
+    def _allocate(self, key):
+        from src.models.user import db
+
+        with self._lock:
+            pool = self._pools.get(key)
+        if pool is None:
+            pool = self._load_pool(key)
+
+        with self._lock:
+            pool = self._pools.setdefault(key, pool)
+            name = pool.allocate()
+        db.session.info.setdefault('allocated_names', []).append((key, name))
+        return name
+
+    def _load_pool(self, key):
+        from src.models.game import Player, Team
+        from src.models.user import db
+
+        kind, game_id = key
+        if kind == 'nickname':
+            # A játékosnak nincs game_id oszlopa: az aktív játékosok az aktív játékéi
+            used = db.session.query(Player.nickname).filter_by(is_active=True)
+            base_names = WEDDING_NICKNAMES
+        else:
+            used = db.session.query(Team.name).filter_by(game_id=game_id, is_active=True)
+            base_names = TEAM_NAMES
+        pool = NamePool(base_names, [name for name, in used])
+
+        with self._lock:
+            # Korábbi játékok készletei már nem kellenek
+            for stale_key in [k for k in self._pools if k[1] != game_id]:
+                del self._pools[stale_key]
+        return pool
+
+    def _pools_for(self, key):
+        kind, game_id = key
+        if game_id is not None:
+            pool = self._pools.get(key)
+            return [pool] if pool else []
+        return [pool for (pool_kind, _), pool in self._pools.items() if pool_kind == kind]
+
+    def _apply(self, releases=(), reactivations=()):
+        with self._lock:
+            for key, name in releases:
+                for pool in self._pools_for(key):
+                    pool.release(name)
+            for key, name in reactivations:
+                for pool in self._pools_for(key):
+                    pool.mark_used(name)
+
+name_allocator = NameAllocator()
+
+def _pool_entry(obj):
+    """(készlet kulcs, név) egy játékos vagy csapat sorhoz; None más táblánál"""
+    table = getattr(obj, '__table__', None)
+    if table is None:
+        return None
+    if table.name == 'team':
+        return ('team', obj.game_id), obj.name
+    if table.name == 'player':
+        # A játékosnak nincs game_id oszlopa: az (egyetlen) élő becenév készlethez tartozik
+        return ('nickname', None), obj.nickname
+    return None
+
+def _track_deactivations(session, flush_context):
+    releases = session.info.setdefault('released_names', [])
+    reactivations = session.info.setdefault('reactivated_names', [])
+    for obj in session.dirty:
+        if getattr(obj, '__table__', None) is None or obj.__table__.name not in ('player', 'team'):
+            continue
+        history = inspect(obj).attrs.is_active.history
+        if not history.has_changes():
+            continue
+        entry = _pool_entry(obj)
+        if entry is None:
+            continue
+        # Commit után lejárt attribútumnál a régi érték ismeretlen (deleted üres)
+        was_active = history.deleted[0] if history.deleted else not obj.is_active
+        if was_active and not obj.is_active:
+            releases.append(entry)
+        elif obj.is_active and not was_active:
+            reactivations.append(entry)
+    for obj in session.deleted:
+        entry = _pool_entry(obj)
+        if entry is not None and obj.is_active:
+            releases.append(entry)
+
+def _release_after_commit(session):
+    session.info.pop('allocated_names', None)
+    name_allocator._apply(
+        session.info.pop('released_names', ()),
+        session.info.pop('reactivated_names', ())
+    )
+
+def _return_uncommitted(session, transaction):
+    if transaction.parent is not None:
+        return
+    # Visszagördítés vagy commit nélküli lezárás: a ki nem mentett nevek visszakerülnek
+    name_allocator._apply(session.info.pop('allocated_names', ()))
+    session.info.pop('released_names', None)
+    session.info.pop('reactivated_names', None)
+
+def init_name_allocator(app, db):
+    """Session események: commit után felszabadítás, visszagördítéskor visszavétel"""
+    if not event.contains(Session, 'after_flush', _track_deactivations):
+        event.listen(Session, 'after_flush', _track_deactivations)
+        event.listen(Session, 'after_commit', _release_after_commit)
+        event.listen(Session, 'after_transaction_end', _return_uncommitted)
@@ -0,0 +1,19 @@
+"""
+Becenevek és csapatnevek
+"""
+
+# Vicces esküvői becenevek
+WEDDING_NICKNAMES = [
+    'Nászmester', 'Koszorúslány', 'Vőfély', 'Menyasszonytáncoltató', 'Anyós-álom',
+    'Torta-őrző', 'Pezsgő-nyitó', 'Rizs-szóró', 'Csokor-fogó', 'Gyűrű-hordó',
+    'Tánc-király', 'Ital-kóstoló', 'Fotó-bombázó', 'Köszöntő-mester', 'Parti-állat',
+    'Menyasszonyi-ruha-őr', 'Vőlegény-segéd', 'Esküvői-DJ', 'Torta-kóstoló', 'Virágszóró'
+]
+
+# Vicces csapatnevek
+TEAM_NAMES = [
+    'Tüllkommandó', 'Csokornyakkendő-maffia', 'Lakodalmas Lámák', 'A Gyűrűk Urai',
+    'Váltságdíj a Menyasszonyért', 'Pezsgőpukkantók', 'Torta-kommandó', 'Az Igen Bajnokai',
+    'Csokor-dobó Brigád', 'Rizsszórás Mesterei', 'A Házasság Huszárjai', 'Parti-piramisok',
+    'Esküvői Elit', 'Menyasszonyi Maffia', 'Vőlegény Vikingek', 'Lakodalmas Legendák'
+]
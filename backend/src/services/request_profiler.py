@@ -0,0 +1,159 @@
+"""
+Kérésenkénti SQL számláló és időmérés (opcionális, REQUEST_PROFILING=1)
+"""
+
+import os
+import threading
+import time
+
+from flask import g, has_request_context, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+
+# Ennyi SQL utasítás felett figyelmeztetés a naplóba (pl. tagonkénti lekérdezések)
+DEFAULT_QUERY_BUDGET = 25
+
+class EndpointStats:
+    """Egy végpont összesített mérései"""
+
+    __slots__ = ('count', 'queries', 'sql_time', 'serialize_time', 'wall_time',
+                 'max_queries', 'max_wall_time')
+
+    def __init__(self):
+        self.count = 0
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serialize_time = 0.0
+        self.wall_time = 0.0
+        self.max_queries = 0
+        self.max_wall_time = 0.0
+
+    def add(self, queries, sql_time, serialize_time, wall_time):
+        self.count += 1
+        self.queries += queries
+        self.sql_time += sql_time
+        self.serialize_time += serialize_time
+        self.wall_time += wall_time
+        self.max_queries = max(self.max_queries, queries)
+        self.max_wall_time = max(self.max_wall_time, wall_time)
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'avg_queries': round(self.queries / self.count, 2),
+            'max_queries': self.max_queries,
+            'avg_sql_ms': round(self.sql_time * 1000 / self.count, 2),
+            'avg_serialize_ms': round(self.serialize_time * 1000 / self.count, 2),
+            'avg_wall_ms': round(self.wall_time * 1000 / self.count, 2),
+            'max_wall_ms': round(self.max_wall_time * 1000, 2)
+        }
+
+class RequestProfiler:
+    """Végpontonkénti összesítés a folyamat memóriájában"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, queries, sql_time, serialize_time, wall_time):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats()
+            stats.add(queries, sql_time, serialize_time, wall_time)
+
+    def snapshot(self):
+        """Végpontonkénti összesítés, a legtöbb összidőt elvivő végpont elöl"""
+        with self._lock:
+            items = [{'endpoint': endpoint, **stats.to_dict()}
+                     for endpoint, stats in self._endpoints.items()]
+        items.sort(key=lambda item: item['avg_wall_ms'] * item['count'], reverse=True)
+        return items
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+request_profiler = RequestProfiler()
+
+class ProfilingJSONProvider(DefaultJSONProvider):
+    """JSON szerializálás ideje a kérés méréseihez"""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            if has_request_context() and 'profile_serialize_time' in g:
+                g.profile_serialize_time += time.perf_counter() - started
+
+def is_profiling_enabled():
+    """A REQUEST_PROFILING környezeti változó (1/true/yes) kapcsolja be"""
+    return os.environ.get('REQUEST_PROFILING', '').lower() in ('1', 'true', 'yes')
+
+def init_request_profiler(app, db, enabled=None):
+    """Mérés bekötése (db.init_app után hívandó); kikapcsolva semmit nem módosít"""
+    if enabled is None:
+        enabled = is_profiling_enabled()
+    app.config['REQUEST_PROFILING'] = enabled
+    if not enabled:
+        return
+
+    query_budget = app.config.setdefault('REQUEST_PROFILING_QUERY_BUDGET', DEFAULT_QUERY_BUDGET)
+    app.json_provider_class = ProfilingJSONProvider
+    app.json = ProfilingJSONProvider(app)
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'profile_queries' in g:
+            conn.info.setdefault('profile_query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('profile_query_start')
+        if not starts or not has_request_context() or 'profile_queries' not in g:
+            return
+        g.profile_queries += 1
+        g.profile_sql_time += time.perf_counter() - starts.pop()
+
+    @app.before_request
+    def start_request_timer():
+        g.profile_started = time.perf_counter()
+        g.profile_queries = 0
+        g.profile_sql_time = 0.0
+        g.profile_serialize_time = 0.0
+
+    @app.after_request
+    def add_server_timing(response):
+        if 'profile_started' not in g:
+            return response
+
+        wall_time = time.perf_counter() - g.profile_started
+        endpoint = request.endpoint or 'unknown'
+        queries = g.profile_queries
+        request_profiler.record(endpoint, queries, g.profile_sql_time,
+                                g.profile_serialize_time, wall_time)
+
+        response.headers.add('Server-Timing', ', '.join([
+            f'db;dur={g.profile_sql_time * 1000:.2f};desc="{queries} SQL"',
+            f'serialize;dur={g.profile_serialize_time * 1000:.2f}',
+            f'total;dur={wall_time * 1000:.2f}'
+        ]))
+        # A frontend más originről fut: enélkül a böngésző elrejti a Server-Timing értékeket
+        response.headers['Timing-Allow-Origin'] = '*'
+        if queries > query_budget:
+            app.logger.warning('%s: %d SQL utasítás egy kérésben (keret: %d)',
+                               endpoint, queries, query_budget)
+        return response
+
+    def get_request_profile():
+        """Végpontonkénti összesítés; ?reset=1 után nulláról indul"""
+        profile = request_profiler.snapshot()
+        if request.args.get('reset'):
+            request_profiler.reset()
+        return jsonify({'endpoints': profile})
+
+    app.add_url_rule('/api/debug/request-profile', 'request_profile', get_request_profile)
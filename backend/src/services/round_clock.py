@@ -0,0 +1,56 @@
+"""
+Monoton órához horgonyzott kör időmérés - a rendszeróra állítása nem hat a szavazási időre
+"""
+
+import threading
+import time
+from datetime import datetime
+
+ANCHOR_LIMIT = 256  # Ennyi kör horgonyát tartjuk meg (a régiek már rég lezárultak)
+
+def wall_time_ms():
+    """Szerver idő (UTC, epoch ezredmásodperc) - a kliensek ehhez szinkronizálnak"""
+    return time.time_ns() // 1_000_000
+
+class RoundClock:
+    """Körönként a szavazás kezdete a monoton órán
+
+    A horgony a kör létrehozásakor (vagy az első találkozáskor, pl. másik
+    worker által indított körnél) egyszer számolódik a tárolt
+    voting_start_time-ból; utána minden eltelt idő és határidő monoton.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._anchors = {}  # round_id -> kezdés a time.monotonic() skáláján
+
+    def start(self, round_):
+        """A kör kezdete monoton időben (első hívásra horgonyozva)"""
+        anchor = self._anchors.get(round_.id)
+        if anchor is not None:
+            return anchor
+
+        with self._lock:
+            anchor = self._anchors.get(round_.id)
+            if anchor is None:
+                since_start = (datetime.utcnow() - round_.voting_start_time).total_seconds()
+                anchor = time.monotonic() - since_start
+                if len(self._anchors) >= ANCHOR_LIMIT:
+                    self._anchors.pop(next(iter(self._anchors)))
+                self._anchors[round_.id] = anchor
+        return anchor
+
+    def elapsed(self, round_):
+        """A szavazás kezdete óta eltelt másodpercek"""
+        return time.monotonic() - self.start(round_)
+
+    def forget(self, round_id):
+        with self._lock:
+            self._anchors.pop(round_id, None)
+
+    @staticmethod
+    def to_wall_ms(monotonic_deadline):
+        """Monoton határidő átváltása a kliensnek küldött abszolút szerver időre"""
+        return wall_time_ms() + int((monotonic_deadline - time.monotonic()) * 1000)
+
+round_clock = RoundClock()
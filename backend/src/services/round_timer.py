@@ -0,0 +1,364 @@
+"""
+Szerver oldali kör időzítő - a szavazási idő leteltével automatikusan lezárja a kört
+"""
+
+import heapq
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from . import metrics
+from .lun_engine import round_engines
+from .round_clock import round_clock, wall_time_ms
+from .settings_cache import settings_cache
+from .state_cache import state_cache
+from .state_stream import broadcaster
+from .vote_buffer import vote_buffer
+
+VOTING_GRACE_SECONDS = 0.3  # A szavazási idő után ennyi türelmi idő jár
+RETRY_SECONDS = 1  # Szünetelő játék vagy sikertelen lezárás után újrapróbálás
+CLOSE_BARRIER_MARGIN_SECONDS = 0.1  # Lezárás jelzése után a többi worker kiírására ennyivel tovább várunk
+STALE_CLAIM_SECONDS = 30  # Ennél régebben calculating állapotú kör: a lezáró folyamat elhalt
+
+def round_deadline(round_, voting_duration):
+    """A szavazás vége a monoton órán (time.monotonic), türelmi idővel együtt"""
+    return round_clock.start(round_) + voting_duration + VOTING_GRACE_SECONDS
+
+def voting_timing(round_, voting_duration):
+    """Visszaszámláláshoz: abszolút szerver határidő (epoch ms, /api/time szerinti idő)
+
+    A kliens egyszer kéri le, és helyben számol vissza; a hátralévő idő csak
+    tájékoztató, a késői szavazatot a szerver a monoton határidő alapján utasítja el.
+    """
+    regular_deadline = round_deadline(round_, voting_duration)
+    deadline = round_timer.deadline_for(round_, voting_duration)
+    # A türelmi időt nem mutatjuk; korai zárásnál az maga a határidő
+    shown_deadline = regular_deadline - VOTING_GRACE_SECONDS if deadline == regular_deadline else deadline
+    now = time.monotonic()
+    return {
+        'voting_duration_seconds': voting_duration,
+        'voting_deadline_ms': round_clock.to_wall_ms(shown_deadline),
+        'server_time_ms': wall_time_ms(),
+        'time_remaining': max(0, shown_deadline - now),
+        'is_voting_active': round_.state == 'voting' and round_.voting_end_time is None and now <= deadline
+    }
+
+def build_round_result(current_round, team_votes, winner_team_id, winning_number):
+    """Kör eredménye a /vote/finalize válasz formátumában"""
+    winner_data = team_votes.get(winner_team_id)
+    return {
+        'success': True,
+        'round_id': current_round.id,
+        'round_number': current_round.round_number,
+        'winner_team_id': winner_team_id,
+        'winning_number': winning_number,
+        'winner_data': winner_data,
+        'team_votes': team_votes,
+        'is_tie': winner_team_id is None,
+        'message': f'Nyertes: {winner_data["team_name"]} ({winning_number})' if winner_team_id else 'Döntetlen - mindenki iszik! 🍻'
+    }
+
+def stored_round_result(current_round):
+    """Már lezárt kör eredménye az adatbázisból (ismételt lezárási kérésre)"""
+    team_votes = current_round.get_team_final_votes()
+    winner_team_id = current_round.winner_team_id
+    winner_data = team_votes.get(winner_team_id)
+    winning_number = winner_data['final_number'] if winner_data else None
+    return build_round_result(current_round, team_votes, winner_team_id, winning_number)
+
+def finalize_round(round_id):
+    """Kör lezárása pontosan egyszer (időzítő, moderátor vagy másik worker közül egy nyer)
+
+    A lezárás két lépésben történik: előbb a voting_end_time beírása jelzi
+    minden folyamatnak, hogy új szavazatot ne fogadjon el, majd a saját puffer
+    kiírásának megvárása után a feltételes, commitolt állapotváltás
+    (calculating). Ha más worker is ír, annak kiírási ciklusát is kivárjuk,
+    így az ott már visszaigazolt szavazatok is bekerülnek az eredménybe.
+
+    Visszatérési érték a kör eredménye, vagy None, ha a kört már más lezárta.
+    TimeoutError, ha a pufferelt szavazatok nem íródtak ki időben.
+    """
+    from src.models.game import QuizQuestion, Round
+    from src.models.user import db
+
+    started = time.perf_counter()
+
+    # Lezárás jelzése minden workernek (a szavazás végpont a voting_end_time-ot is nézi)
+    closing = Round.query.filter_by(id=round_id, state='voting').update(
+        {'voting_end_time': datetime.utcnow()},
+        synchronize_session=False
+    )
+    db.session.commit()
+    if not closing:
+        return None
+    barrier_deadline = time.monotonic() + vote_buffer.flush_interval + CLOSE_BARRIER_MARGIN_SECONDS
+
+    # Pufferelt szavazatok kiírásának megvárása; a lezárt körre már nem fogadunk szavazatot
+    if not vote_buffer.flush(close_round_id=round_id):
+        reopen_round(round_id)
+        raise TimeoutError('A szavazatok mentése folyamatban, próbáld újra')
+
+    # Más worker a jelzés előtt elfogadott szavazatait legfeljebb egy kiírási ciklus alatt írja be
+    state_cache.sync()
+    if state_cache.foreign_changes_seen:
+        time.sleep(max(0, barrier_deadline - time.monotonic()))
+
+    # Feltételes állapotváltás: csak az a kérés folytatja, amelyik még szavazó kört talált.
+    # Commitolva, így a többi kérés (és worker) a folyamatban lévő lezárást látja.
+    claimed = Round.query.filter_by(id=round_id, state='voting').update(
+        {'state': 'calculating'},
+        synchronize_session=False
+    )
+    db.session.commit()
+    if not claimed:
+        return None
+
+    try:
+        current_round = db.session.get(Round, round_id, populate_existing=True)
+
+        # Nyertes az élő LUN motorból (egy ellenőrző lekérdezés, újraszámolás nélkül)
+        engine = round_engines.get(current_round, verify=True)
+        team_votes = engine.team_votes()
+        winner_team_id, winning_number = engine.current_winner()
+
+        if winner_team_id:
+            current_round.winner_team_id = winner_team_id
+            current_round.state = 'quiz'
+
+            # Kvízkérdés kiválasztása
+            quiz_question = QuizQuestion.query.filter_by(is_active=True).first()
+            if quiz_question:
+                current_round.quiz_question = quiz_question.question
+                current_round.quiz_answer = quiz_question.answer
+        else:
+            # Döntetlen - mindenki iszik
+            current_round.state = 'completed'
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        # A kör visszakerül szavazó állapotba: a szavazás folytatható
+        reopen_round(round_id, claimed=True)
+        raise
+
+    round_engines.discard(round_id)
+    round_timer.cancel(round_id)
+    metrics.finalize_duration.observe(time.perf_counter() - started)
+
+    result = build_round_result(current_round, team_votes, winner_team_id, winning_number)
+    broadcaster.publish_event('round_result', json.dumps(result, ensure_ascii=False))
+    return result
+
+def reopen_round(round_id, claimed=False):
+    """Sikertelen lezárás után a kör újra szavazatot fogad (minden workerben)
+
+    claimed: a hívó már calculating állapotba tette a kört (a más kérés által
+    elkezdett számolást nem írjuk felül).
+    """
+    from src.models.game import Round
+    from src.models.user import db
+
+    vote_buffer.reopen_round(round_id)
+    states = ('voting', 'calculating') if claimed else ('voting',)
+    Round.query.filter(Round.id == round_id, Round.state.in_(states)).update(
+        {'state': 'voting', 'voting_end_time': None},
+        synchronize_session=False
+    )
+    db.session.commit()
+
+class RoundTimer:
+    """Szavazó körök határideje egy kupacban, egyetlen időzítő szállal
+
+    A határidőt a játék aktuális beállításaiból (tényleges szavazási idő +
+    türelmi idő) számolja, és lejáratkor újra ellenőrzi, így a menet közbeni
+    beállítás módosítás is érvényesül. Szünetelő játékot nem zár le. Minden
+    határidő monoton időben értendő, a rendszeróra állítása nem hat rá.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._deadlines = {}  # round_id -> határidő (monoton)
+        self._early_deadlines = {}  # round_id -> korai zárás ideje (mindenki szavazott)
+        self._heap = []  # (határidő, round_id) - elavult bejegyzéseket is tartalmazhat
+        self._app = None
+        self._thread = None
+        self._thread_pid = None
+
+    def configure(self, app):
+        self._app = app
+
+    def schedule(self, round_):
+        """Szavazó kör felvétele (commit után, alkalmazás kontextusban hívandó)"""
+        if self._app is None or round_.state != 'voting':
+            return
+        self._set_deadline(round_.id, self.deadline_for(round_, settings_cache.get(round_.game_id).voting_duration))
+
+    def close_early(self, round_, settle_seconds):
+        """Minden aktív tag szavazott: lezárás a várakozási idő után
+
+        Egy körre csak egyszer ütemez (a további szavazatok nem tolják ki),
+        és sosem későbbre, mint a rendes határidő.
+        """
+        if self._app is None:
+            return
+        early_deadline = time.monotonic() + settle_seconds
+        with self._condition:
+            if round_.id in self._early_deadlines:
+                return
+            deadline = self._deadlines.get(round_.id)
+            if deadline is not None and deadline <= early_deadline:
+                return
+            self._early_deadlines[round_.id] = early_deadline
+        self._set_deadline(round_.id, early_deadline)
+
+        # A kliensek a közölt határidőig számolnak vissza: az új határidőt le kell küldeni
+        broadcaster.publish_event('round_deadline', json.dumps({
+            'round_id': round_.id,
+            'voting_deadline_ms': round_clock.to_wall_ms(early_deadline)
+        }))
+
+    def deadline_for(self, round_, voting_duration):
+        """A kör érvényes határideje (monoton): a rendes vagy a korábbi korai zárás"""
+        deadline = round_deadline(round_, voting_duration)
+        with self._condition:
+            early_deadline = self._early_deadlines.get(round_.id)
+        return min(deadline, early_deadline) if early_deadline else deadline
+
+    def cancel(self, round_id):
+        with self._condition:
+            self._deadlines.pop(round_id, None)
+            self._early_deadlines.pop(round_id, None)
+
+    def refresh(self, game_id):
+        """Beállítás módosítás után: a játék szavazó köreinek határideje újraszámolva"""
+        from src.models.game import Round
+
+        if self._app is None:
+            return
+        with self._condition:
+            round_ids = list(self._deadlines)
+        for round_ in Round.query.filter(Round.id.in_(round_ids), Round.game_id == game_id).all():
+            self.schedule(round_)
+
+    def recover(self):
+        """Indításkor: az aktív játékok még szavazó körei (pl. újraindított szerver után)"""
+        from src.models.game import Game, Round
+
+        # Lezárás közben elhalt folyamat után a kör újra szavazhatóvá válik
+        stale_claims = Round.query.filter(
+            Round.state == 'calculating',
+            Round.voting_end_time < datetime.utcnow() - timedelta(seconds=STALE_CLAIM_SECONDS)
+        ).with_entities(Round.id).all()
+        for round_id, in stale_claims:
+            reopen_round(round_id, claimed=True)
+
+        voting_rounds = Round.query.join(Game, Game.id == Round.game_id).filter(
+            Game.is_active == True,
+            Round.state == 'voting'
+        ).all()
+        for round_ in voting_rounds:
+            self.schedule(round_)
+        return len(voting_rounds)
+
+    def pending_deadlines(self):
+        with self._condition:
+            return dict(self._deadlines)
+
+    def _set_deadline(self, round_id, deadline):
+        with self._condition:
+            self._deadlines[round_id] = deadline
+            heapq.heappush(self._heap, (deadline, round_id))
+            self._condition.notify()
+        self._ensure_thread()
+
+    def _ensure_thread(self):
+        """Időzítő szál indítása első ütemezéskor (forkolt worker folyamatban újra)"""
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive() and self._thread_pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name='round-timer', daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def _next_due(self):
+        """Várakozás a legközelebbi határidőig; a lejárt kör azonosítója"""
+        with self._condition:
+            while True:
+                # Elavult (törölt vagy átütemezett) bejegyzések eldobása
+                while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                deadline, round_id = self._heap[0]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    heapq.heappop(self._heap)
+                    del self._deadlines[round_id]
+                    return round_id
+                self._condition.wait(remaining)
+
+    def _run(self):
+        while True:
+            round_id = self._next_due()
+            with self._app.app_context():
+                from src.models.user import db
+                try:
+                    self._fire(round_id)
+                except Exception as e:
+                    self._app.logger.error('Automatikus kör lezárás sikertelen (%s): %s', round_id, e)
+                    self._retry(round_id)
+                finally:
+                    db.session.remove()
+
+    def _fire(self, round_id):
+        from src.models.game import Game, Round
+        from src.models.user import db
+
+        current_round = db.session.get(Round, round_id)
+        if current_round is None or current_round.state != 'voting':
+            return
+        game = db.session.get(Game, current_round.game_id)
+        if game is None or not game.is_active:
+            return
+        if game.is_paused:
+            self._retry(round_id)
+            return
+
+        # A beállítás közben változhatott (pl. hosszabb szavazási idő)
+        deadline = round_deadline(current_round, settings_cache.get(game.id).voting_duration)
+        with self._condition:
+            early_deadline = self._early_deadlines.pop(round_id, None)
+        if early_deadline and early_deadline < deadline:
+            # Az utolsó szavazat még a pufferben lehet (0 mp várakozásnál szinte biztosan):
+            # az adatbázisból ellenőrző motor csak kiírás után látja
+            if not vote_buffer.flush():
+                with self._condition:
+                    self._early_deadlines.setdefault(round_id, early_deadline)
+                self._set_deadline(round_id, time.monotonic() + vote_buffer.flush_interval)
+                return
+            # Közben csapatváltozás lehetett: csak akkor zárunk korán, ha még mindig mindenki szavazott
+            if round_engines.get(current_round, verify=True).all_members_voted():
+                deadline = early_deadline
+        if deadline > time.monotonic():
+            self._set_deadline(round_id, deadline)
+            return
+
+        finalize_round(round_id)
+
+    def _retry(self, round_id):
+        self._set_deadline(round_id, time.monotonic() + RETRY_SECONDS)
+
+round_timer = RoundTimer()
+
+def init_round_timer(app, db):
+    """Automatikus lezárás bekötése és a futó körök visszaállítása (séma létrehozás után)"""
+    app.config.setdefault('ROUND_AUTO_FINALIZE', True)
+    if not app.config['ROUND_AUTO_FINALIZE']:
+        return
+
+    round_timer.configure(app)
+    with app.app_context():
+        round_timer.recover()
@@ -0,0 +1,79 @@
+"""
+Játék beállítások folyamatszintű gyorsítótára
+"""
+
+import threading
+from collections import namedtuple
+
+from .generation_marker import GenerationMarker, marker_path_for
+
+# Előre kiszámolt, csak olvasható beállítások a szavazási útvonalhoz
+CachedSettings = namedtuple('CachedSettings', [
+    'game_id', 'voting_duration', 'number_range', 'protection_enabled',
+    'rescue_round_enabled', 'early_close_enabled', 'early_close_settle_seconds', 'data'
+])
+
+class SettingsCache:
+    """Játékonként egyszer betöltött beállítások
+
+    Csak a beállításokat módosító végpontok érvénytelenítik; más worker
+    folyamatok módosítását a közös jelzőfájl mutatja.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._marker = GenerationMarker()
+        self._entries = {}
+        self._seen_stamp = None
+        self._generation = 0
+
+    def configure(self, database_path):
+        self._marker.configure(marker_path_for(database_path, 'settings'))
+
+    def get(self, game_id):
+        """Beállítások lekérdezés nélkül (első alkalommal adatbázisból töltve)"""
+        stamp = self._marker.stamp()
+        if stamp != self._seen_stamp:
+            with self._lock:
+                self._entries.clear()
+                self._seen_stamp = stamp
+
+        entry = self._entries.get(game_id)
+        if entry:
+            return entry
+
+        from src.models.game_settings import get_or_create_game_settings
+
+        generation = self._generation
+        entry = self.build_entry(get_or_create_game_settings(game_id))
+        with self._lock:
+            if generation == self._generation:
+                self._entries[game_id] = entry
+        return entry
+
+    def invalidate(self, game_id):
+        """Beállítás módosítás után hívandó (commit után)"""
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(game_id, None)
+            self._seen_stamp = self._marker.touch()
+
+    @staticmethod
+    def build_entry(settings):
+        return CachedSettings(
+            game_id=settings.game_id,
+            voting_duration=settings.get_voting_duration(),
+            number_range=settings.get_number_range(),
+            protection_enabled=settings.protection_enabled,
+            rescue_round_enabled=settings.rescue_round_enabled,
+            early_close_enabled=bool(settings.early_close_enabled),
+            early_close_settle_seconds=settings.get_early_close_settle_seconds(),
+            data=settings.to_dict()
+        )
+
+settings_cache = SettingsCache()
+
+def init_settings_cache(app, db):
+    """Jelzőfájl beállítása az alkalmazás adatbázisa mellé"""
+    with app.app_context():
+        settings_cache.configure(db.engine.url.database)
@@ -0,0 +1,163 @@
+"""
+Verziózott, előre szerializált játékállapot gyorsítótár
+"""
+
+import hashlib
+import itertools
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .generation_marker import GenerationMarker, marker_path_for
+
+# Ezeknek a tábláknak a módosulása érinti a kliensek által látott állapotot
+TRACKED_TABLES = {'game', 'team', 'player', 'round', 'vote', 'game_settings', 'supporter_tokens'}
+
+StateSnapshot = namedtuple('StateSnapshot', ['game_id', 'version', 'body', 'etag'])
+
+_UNKNOWN = object()
+
+def _changed_game_id(obj):
+    """Módosult objektum játék azonosítója (None, ha közvetlenül nem ismert)"""
+    if obj.__table__.name == 'game':
+        return obj.id
+    return getattr(obj, 'game_id', None)
+
+class GameStateCache:
+    """Játékonként monoton növekvő állapotverzió és a hozzá tartozó pillanatkép"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        # Időalapú kezdőérték: újraindítás után is növekvő marad a verzió
+        self._seed = int(time.time() * 1000)
+        self._versions = {}
+        self._snapshots = {}
+        self._active_game_id = _UNKNOWN
+        self._listeners = []
+        # Más worker folyamatok commitjainak észlelése
+        self._marker = GenerationMarker()
+        self._seen_stamp = None
+        self.foreign_changes_seen = False  # volt-e már más worker folyamat commitja
+
+    def configure(self, database_path):
+        self._marker.configure(marker_path_for(database_path, 'state'))
+        # Egy korábbi futás jelzőfájlja nem másik élő worker
+        self._seen_stamp = self._marker.stamp()
+
+    def add_listener(self, callback):
+        """Értesítés feliratkozása minden verzióváltásra (a módosult táblák nevével)"""
+        self._listeners.append(callback)
+
+    def version(self, game_id):
+        return self._versions.get(game_id, self._seed)
+
+    def bump(self, game_ids, changed_tables=(), active_game_changed=False):
+        """Érintett játékok verziójának növelése (None: ismeretlen játék, mindet érinti)"""
+        self._apply_change(game_ids, changed_tables, active_game_changed)
+        self._seen_stamp = self._marker.touch()
+        self._notify(changed_tables)
+
+    def sync(self):
+        """Más folyamat által jelzett változás átvétele (egyetlen os.stat hívás)"""
+        stamp = self._marker.stamp()
+        if stamp == self._seen_stamp:
+            return False
+        self._seen_stamp = stamp
+        self.foreign_changes_seen = True
+        # Nem tudjuk, mi változott: minden játék és tábla érintett
+        self._apply_change({None}, None, True)
+        self._notify(None)
+        return True
+
+    def _apply_change(self, game_ids, changed_tables, active_game_changed):
+        with self._lock:
+            if None in game_ids:
+                game_ids = set(self._versions) | set(self._snapshots) | (set(game_ids) - {None})
+            for game_id in game_ids:
+                self._versions[game_id] = self.version(game_id) + 1
+            if active_game_changed:
+                self._active_game_id = _UNKNOWN
+
+    def _notify(self, changed_tables):
+        for callback in self._listeners:
+            callback(changed_tables)
+
+    def get_active_snapshot(self, builder):
+        """Aktív játék pillanatképe; a builder csak verzióváltás után fut le
+
+        A builder (game_id, payload_json) párt ad vissza, game_id None ha nincs aktív játék.
+        Az ETag a tartalom lenyomata, így minden worker folyamat ugyanazt adja.
+        """
+        self.sync()
+        snapshot = self._current_snapshot()
+        if snapshot:
+            return snapshot
+
+        with self._build_lock:
+            # Közben egy másik szál már felépíthette
+            snapshot = self._current_snapshot()
+            if snapshot:
+                return snapshot
+
+            # A verziókat építés előtt rögzítjük: ha közben változás jön, a következő kérés újraépít
+            versions = dict(self._versions)
+            game_id, body = builder()
+            if game_id is None:
+                return None
+
+            version = versions.get(game_id, self._seed)
+            etag = hashlib.blake2b(body.encode('utf-8'), digest_size=10).hexdigest()
+            snapshot = StateSnapshot(game_id, version, body, etag)
+            with self._lock:
+                self._snapshots[game_id] = snapshot
+                self._active_game_id = game_id
+            return snapshot
+
+    def _current_snapshot(self):
+        game_id = self._active_game_id
+        if game_id is _UNKNOWN:
+            return None
+        snapshot = self._snapshots.get(game_id)
+        if snapshot and snapshot.version == self.version(game_id):
+            return snapshot
+        return None
+
+state_cache = GameStateCache()
+
+def _track_changes(session, flush_context):
+    changed = session.info.setdefault('changed_game_ids', set())
+    tables = session.info.setdefault('changed_tables', set())
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is None or table.name not in TRACKED_TABLES:
+            continue
+        changed.add(_changed_game_id(obj))
+        tables.add(table.name)
+        if table.name == 'game':
+            session.info['active_game_changed'] = True
+
+def _bump_after_commit(session):
+    changed = session.info.pop('changed_game_ids', None)
+    tables = session.info.pop('changed_tables', set())
+    active_game_changed = session.info.pop('active_game_changed', False)
+    if changed:
+        state_cache.bump(changed, tables, active_game_changed)
+
+def _discard_after_rollback(session):
+    session.info.pop('changed_game_ids', None)
+    session.info.pop('changed_tables', None)
+    session.info.pop('active_game_changed', None)
+
+def init_state_cache(app, db):
+    """Session események bekötése: sikeres commit után verzióváltás"""
+    with app.app_context():
+        state_cache.configure(db.engine.url.database)
+
+    if not event.contains(Session, 'after_flush', _track_changes):
+        event.listen(Session, 'after_flush', _track_changes)
+        event.listen(Session, 'after_commit', _bump_after_commit)
+        event.listen(Session, 'after_rollback', _discard_after_rollback)
@@ -0,0 +1,110 @@
+"""
+Játékállapot változások valós idejű továbbítása (Server-Sent Events)
+"""
+
+import threading
+import time
+from collections import deque
+
+from .metrics import stream_clients
+from .state_cache import state_cache
+
+HEARTBEAT_SECONDS = 15  # Ennyi idő után küldünk életjelet, ha nem volt változás
+COALESCE_SECONDS = 0.1  # Szavazási hullámnál ennyi ideig gyűjtjük a változásokat
+RETRY_MILLISECONDS = 3000  # Kliens újracsatlakozási késleltetése
+SYNC_SECONDS = 0.5  # Ilyen gyakran nézzük meg, jelzett-e változást másik worker
+EVENT_BACKLOG = 32  # Ennyi egyedi eseményt (pl. kör eredmény) őrzünk a lassú klienseknek
+
+class StateBroadcaster:
+    """Változásszámláló, ami felébreszti a várakozó stream klienseket"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._sequence = 0
+        self._events = deque(maxlen=EVENT_BACKLOG)  # (sorszám, esemény neve, adat)
+
+    @property
+    def sequence(self):
+        return self._sequence
+
+    def publish(self, changed_tables=None):
+        """Állapotváltozás jelzése minden várakozó kliensnek"""
+        with self._condition:
+            self._sequence += 1
+            self._condition.notify_all()
+
+    def publish_event(self, event_name, data):
+        """Egyedi esemény (pl. kör eredménye) küldése a folyamat stream klienseinek"""
+        with self._condition:
+            self._sequence += 1
+            self._events.append((self._sequence, event_name, data))
+            self._condition.notify_all()
+
+    def events_since(self, known_sequence):
+        """Az aktuális sorszám és az ismert sorszám óta küldött egyedi események"""
+        with self._condition:
+            return self._sequence, [
+                (event_name, data) for sequence, event_name, data in self._events
+                if sequence > known_sequence
+            ]
+
+    def wait_for_change(self, known_sequence, timeout):
+        """Várakozás, amíg új változás érkezik (vagy lejár az idő)"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._sequence != known_sequence,
+                    max(0, min(remaining, SYNC_SECONDS))
+                )
+                if self._sequence != known_sequence or remaining <= SYNC_SECONDS:
+                    return self._sequence
+            # Más worker folyamat változásai (ha van, a listener felébreszt minket)
+            state_cache.sync()
+
+broadcaster = StateBroadcaster()
+state_cache.add_listener(broadcaster.publish)
+
+def format_event(data, event_id=None, event_name='state'):
+    """Egy SSE üzenet összeállítása"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event_name}')
+    lines.append(f'data: {data}')
+    return '\n'.join(lines) + '\n\n'
+
+def generate_state_events(builder, last_event_id=None):
+    """SSE generátor: állapot küldése csak változáskor, közben életjel
+
+    Az esemény ID a pillanatkép ETag-je, így újracsatlakozáskor (Last-Event-ID)
+    a már ismert állapotot nem küldjük újra.
+    """
+    yield f'retry: {RETRY_MILLISECONDS}\n\n'
+
+    sent_etag = last_event_id
+    known_sequence = None
+
+    stream_clients.inc()
+    try:
+        while True:
+            if known_sequence != broadcaster.sequence:
+                if known_sequence is None:
+                    known_sequence = broadcaster.sequence
+                else:
+                    time.sleep(COALESCE_SECONDS)
+                    known_sequence, events = broadcaster.events_since(known_sequence)
+                    for event_name, data in events:
+                        yield format_event(data, event_name=event_name)
+                snapshot = state_cache.get_active_snapshot(builder)
+                if snapshot and snapshot.etag != sent_etag:
+                    sent_etag = snapshot.etag
+                    yield format_event(snapshot.body, event_id=snapshot.etag)
+                continue
+
+            if broadcaster.wait_for_change(known_sequence, HEARTBEAT_SECONDS) == known_sequence:
+                yield ': heartbeat\n\n'
+    finally:
+        # A kliens bontásakor a WSGI szerver lezárja a generátort
+        stream_clients.dec()
@@ -0,0 +1,96 @@
+"""
+Csapat kiegyensúlyozás: legkevesebb áthelyezés min/max kupacokkal, egy tranzakcióban
+"""
+
+import heapq
+from collections import namedtuple
+
+DEFAULT_MAX_SPREAD = 1  # A legnagyobb és legkisebb csapat közti megengedett különbség
+
+Move = namedtuple('Move', ['player_id', 'from_team_id', 'to_team_id'])
+
+class BalanceConflict(RuntimeError):
+    """Tervezés és végrehajtás között megváltozott egy érintett játékos csapata"""
+
+def plan_moves(team_members, protected_player_ids=(), max_spread=DEFAULT_MAX_SPREAD):
+    """Áthelyezési terv: mindig a legnagyobb (mozgatható taggal bíró) csapatból a legkisebbe
+
+    team_members: {team_id: [player_id, ...]} az aktív csapatok aktív tagjai.
+    A védett játékosok maradnak; csak védett tagokból álló csapat nem ad le
+    senkit. Minden lépés a kupacok tetejéről O(log csapatszám). Determinisztikus
+    (a legújabb tag költözik), így az előnézet és a végrehajtás ugyanazt adja.
+    Visszatérési érték: (lépések listája, csapatméretek a terv után).
+    """
+    protected = set(protected_player_ids)
+    sizes = {team_id: len(members) for team_id, members in team_members.items()}
+    movable = {team_id: sorted(player_id for player_id in members if player_id not in protected)
+               for team_id, members in team_members.items()}
+
+    smallest_heap = [(size, team_id) for team_id, size in sizes.items()]
+    largest_heap = [(-size, team_id) for team_id, size in sizes.items() if movable[team_id]]
+    heapq.heapify(smallest_heap)
+    heapq.heapify(largest_heap)
+
+    moves = []
+    while smallest_heap and largest_heap:
+        # Elavult (azóta módosult méretű) bejegyzések eldobása
+        while sizes[smallest_heap[0][1]] != smallest_heap[0][0]:
+            heapq.heappop(smallest_heap)
+        while largest_heap and (sizes[largest_heap[0][1]] != -largest_heap[0][0]
+                                or not movable[largest_heap[0][1]]):
+            heapq.heappop(largest_heap)
+        if not largest_heap:
+            break
+
+        largest_size, donor = -largest_heap[0][0], largest_heap[0][1]
+        smallest_size, receiver = smallest_heap[0]
+        if largest_size - smallest_size <= max_spread:
+            break
+
+        player_id = movable[donor].pop()
+        sizes[donor] -= 1
+        sizes[receiver] += 1
+        moves.append(Move(player_id, donor, receiver))
+
+        for team_id in (donor, receiver):
+            heapq.heappush(smallest_heap, (sizes[team_id], team_id))
+            if movable[team_id]:
+                heapq.heappush(largest_heap, (-sizes[team_id], team_id))
+
+    return moves, sizes
+
+def balance_teams(game, protected_player_ids=(), max_spread=DEFAULT_MAX_SPREAD, dry_run=False):
+    """Az aktív csapatok kiegyensúlyozása (dry_run: csak a terv)
+
+    A tagokat egyetlen lekérdezés tölti be; az áthelyezések egy commitban
+    íródnak ki. Ha közben egy érintett játékos máshová került vagy kiesett,
+    semmi sem változik (BalanceConflict).
+    """
+    from src.models.game import Player, Team
+    from src.models.user import db
+
+    rows = db.session.query(Player.team_id, Player.id).join(Team, Team.id == Player.team_id).filter(
+        Team.game_id == game.id,
+        Team.is_active == True,
+        Player.is_active == True
+    ).all()
+    team_members = {}
+    for team_id, player_id in rows:
+        team_members.setdefault(team_id, []).append(player_id)
+
+    sizes_before = {team_id: len(members) for team_id, members in team_members.items()}
+    moves, sizes_after = plan_moves(team_members, protected_player_ids, max_spread)
+
+    if moves and not dry_run:
+        players = {player.id: player for player in Player.query.filter(
+            Player.id.in_([move.player_id for move in moves])
+        )}
+        for move in moves:
+            player = players.get(move.player_id)
+            if player is None or not player.is_active or player.team_id != move.from_team_id:
+                db.session.rollback()
+                raise BalanceConflict('A csapatok közben megváltoztak, próbáld újra')
+            player.team_id = move.to_team_id
+        db.session.commit()
+
+    return moves, sizes_before, sizes_after
@@ -0,0 +1,118 @@
+"""
+Csapatok aktív tagszáma (Team.member_count) - a játékos módosításával egy tranzakcióban
+"""
+
+from collections import Counter, namedtuple
+
+from sqlalchemy import and_, bindparam, event, func, inspect, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from .state_cache import state_cache
+
+CountDrift = namedtuple('CountDrift', ['team_id', 'stored', 'actual'])
+
+def _membership(team_id, is_active):
+    """A csapat, amelynek létszámába a játékos beleszámít (vagy None)"""
+    return team_id if team_id is not None and is_active is not False else None
+
+def _previous(history, current):
+    if history.deleted:
+        return history.deleted[0]
+    # active_history miatt a régi érték mindig betöltődik: üres deleted = None volt
+    return None if history.added else current
+
+def _count_deltas(session):
+    from src.models.game import Player
+
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Player):
+            deltas[_membership(obj.team_id, obj.is_active)] += 1
+    for obj in session.dirty:
+        if not isinstance(obj, Player):
+            continue
+        state = inspect(obj).attrs
+        team_history, active_history = state.team_id.history, state.is_active.history
+        if not (team_history.has_changes() or active_history.has_changes()):
+            continue
+        old = _membership(_previous(team_history, obj.team_id), _previous(active_history, obj.is_active))
+        new = _membership(obj.team_id, obj.is_active)
+        if old != new:
+            deltas[old] -= 1
+            deltas[new] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Player):
+            state = inspect(obj).attrs
+            deltas[_membership(_previous(state.team_id.history, obj.team_id),
+                               _previous(state.is_active.history, obj.is_active))] -= 1
+    deltas.pop(None, None)
+    return {team_id: delta for team_id, delta in deltas.items() if delta}
+
+def _apply_deltas(session, flush_context):
+    """Flush után (a külső kulcsok már kitöltve) relatív UPDATE ugyanabban a tranzakcióban"""
+    from src.models.game import Team
+
+    deltas = _count_deltas(session)
+    if not deltas:
+        return
+    team_table = Team.__table__
+    session.execute(
+        update(team_table).where(team_table.c.id == bindparam('counted_team_id')).values(
+            member_count=func.coalesce(team_table.c.member_count, 0) + bindparam('delta')
+        ),
+        [{'counted_team_id': team_id, 'delta': delta} for team_id, delta in deltas.items()]
+    )
+    session.info.setdefault('recounted_teams', set()).update(deltas)
+
+def _expire_counts(session, flush_context):
+    """A betöltött csapatok member_count értéke következő olvasáskor frissül"""
+    from src.models.game import Team
+
+    for team_id in session.info.pop('recounted_teams', ()):
+        team = session.identity_map.get(identity_key(Team, team_id))
+        if team is not None:
+            session.expire(team, ['member_count'])
+
+def _load_old_value(target, value, oldvalue, initiator):
+    """Üres figyelő: csak az active_history kedvéért (lejárt attribútumnál is ismert a régi érték)"""
+
+def check_member_counts(game_id=None, fix=False):
+    """Tárolt és tényleges (aktív) tagszámok összevetése egyetlen GROUP BY lekérdezéssel
+
+    Eltérés csak a session eseményeket megkerülő írás (kézi SQL, régi séma)
+    után lehet. fix esetén az eltérő csapatok értéke javítódik.
+    Visszatérési érték: az eltérések listája (CountDrift).
+    """
+    from src.models.game import Player, Team
+    from src.models.user import db
+
+    query = db.session.query(Team.id, Team.member_count, func.count(Player.id)).outerjoin(
+        Player, and_(Player.team_id == Team.id, Player.is_active == True)
+    ).group_by(Team.id, Team.member_count)
+    if game_id is not None:
+        query = query.filter(Team.game_id == game_id)
+    drift = [CountDrift(*row) for row in query if row[1] != row[2]]
+
+    if fix and drift:
+        team_table = Team.__table__
+        db.session.execute(
+            update(team_table).where(team_table.c.id == bindparam('drifted_team_id')).values(
+                member_count=bindparam('actual')
+            ),
+            [{'drifted_team_id': item.team_id, 'actual': item.actual} for item in drift]
+        )
+        db.session.commit()
+        # A tömeges módosítást a session események nem látják
+        state_cache.bump({game_id}, changed_tables={'team'})
+    return drift
+
+def init_team_counts(app, db):
+    """Session események a tagszámokhoz; a régi értékek mindig betöltődnek a helyes különbséghez"""
+    from src.models.game import Player
+
+    if not event.contains(Session, 'after_flush', _apply_deltas):
+        event.listen(Player.team_id, 'set', _load_old_value, active_history=True)
+        event.listen(Player.is_active, 'set', _load_old_value, active_history=True)
+        event.listen(Session, 'after_flush', _apply_deltas)
+        event.listen(Session, 'after_flush_postexec', _expire_counts)
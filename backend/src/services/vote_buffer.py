@@ -0,0 +1,352 @@
+"""
+Write-behind szavazat puffer - a szavazás azonnal visszaigazol, egyetlen író szál
+köteges tranzakciókban menti a Vote táblába
+"""
+
+import atexit
+import os
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .state_cache import state_cache
+
+FLUSH_INTERVAL_SECONDS = 0.05  # Ennyi időnként írja ki a szál a beérkezett szavazatokat
+FLUSH_TIMEOUT_SECONDS = 5  # Kényszerített kiírásnál legfeljebb ennyit várunk
+RETRY_DELAY_SECONDS = 0.2  # Sikertelen köteg után ennyi szünet az újrapróbálásig
+
+# Elfogadott, még nem (vagy épp most) kiírt szavazat; a Vote-hoz hasonlóan
+# number és updated_at mezője van, így a státusz végpontok egyformán kezelik
+PendingVote = namedtuple('PendingVote', [
+    'game_id', 'round_id', 'player_id', 'team_id', 'number', 'updated_at'
+])
+
+class VoteBuffer:
+    """Memóriabeli szavazat napló egyetlen író szállal
+
+    Játékosonként és körönként csak a legfrissebb szám marad meg, így a
+    gyakori számváltoztatás egyetlen sorírás lesz kötegenként. A köteg
+    saját kapcsolaton, synchronous=FULL mellett kerül commitra: amit a szál
+    kiírt, az áramszünetet is túlél. Visszaigazolt, de még ki nem írt
+    szavazat legfeljebb egy kiírási ciklusnyi ideig él csak memóriában.
+    """
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL_SECONDS):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flushed = threading.Condition(self._lock)
+        self._write_lock = threading.Lock()  # egyszerre egy köteg íródik
+        self._journal_lock = threading.Lock()  # napló megnyitása folyamatonként egyszer
+        self._wake = threading.Event()
+        self._pending = {}  # (round_id, player_id) -> PendingVote
+        self._in_flight = {}  # épp íródó köteg (olvasáskor még ezt is látni kell)
+        self._closed_rounds = set()
+        self._accepted = 0
+        self._written = 0
+        self._journal = None
+        self._journal_opener = None
+        self._journal_pid = None
+        self._engine = None
+        self._logger = None
+        self._connection = None
+        self._thread = None
+        self._thread_pid = None
+        self._stopping = False
+
+    def configure(self, engine, logger=None):
+        self._engine = engine
+        self._logger = logger
+
+    def attach_journal(self, opener):
+        """Összeomlás elleni napló: minden elfogadott szavazat előbb ide kerül
+
+        Az opener folyamatonként egyszer fut (forkolt workerben első szavazatkor
+        újra), így a workerek nem osztoznak a szülő fájlzárán és leképezésén.
+        Visszatérési érték: a visszajátszott szavazatok száma.
+        """
+        self._journal_opener = opener
+        return self._ensure_journal()
+
+    def submit(self, game_id, round_id, player_id, team_id, number, updated_at):
+        """Szavazat elfogadása; False, ha a kört közben lezárták"""
+        vote = PendingVote(game_id, round_id, player_id, team_id, number, updated_at)
+        key = (round_id, player_id)
+        self._ensure_journal()
+        with self._lock:
+            if round_id in self._closed_rounds:
+                return False
+            if self._journal:
+                self._journal.append(vote)
+            current = self._pending.get(key)
+            if current is None or current.updated_at <= updated_at:
+                self._pending[key] = vote
+            self._accepted += 1
+
+        self._ensure_writer()
+        return True
+
+    def restore(self, votes):
+        """Naplóból visszajátszott szavazatok felvétele (újranaplózás nélkül)"""
+        with self._lock:
+            for vote in votes:
+                key = (vote.round_id, vote.player_id)
+                current = self._pending.get(key)
+                if current is None or current.updated_at <= vote.updated_at:
+                    self._pending[key] = vote
+                self._accepted += 1
+
+    def pending_votes(self, round_id):
+        """A kör még adatbázisba nem került szavazatai (player_id -> PendingVote)"""
+        with self._lock:
+            votes = {}
+            for source in (self._in_flight, self._pending):
+                for (vote_round_id, player_id), vote in source.items():
+                    if vote_round_id == round_id:
+                        votes[player_id] = vote
+            return votes
+
+    def overlay(self, round_id, latest_votes):
+        """Adatbázisból olvasott utolsó szavazatok kiegészítése a pufferelt újabbakkal"""
+        pending = self.pending_votes(round_id)
+        if not pending:
+            return latest_votes
+
+        merged = dict(latest_votes)
+        for player_id, vote in pending.items():
+            current = merged.get(player_id)
+            if current is None or current.updated_at is None or current.updated_at <= vote.updated_at:
+                merged[player_id] = vote
+        return merged
+
+    def flush(self, close_round_id=None, timeout=FLUSH_TIMEOUT_SECONDS):
+        """Az eddig elfogadott szavazatok kiírásának megvárása
+
+        close_round_id megadásakor az adott körre ezután nem fogad el szavazatot
+        (kör lezárása előtt hívandó, hogy a lezárás a teljes eredményt lássa).
+        """
+        with self._lock:
+            if close_round_id is not None:
+                self._closed_rounds.add(close_round_id)
+            target = self._accepted
+
+        if not self._writer_alive():
+            return self._write_pending()
+
+        self._wake.set()
+        deadline = time.monotonic() + timeout
+        with self._flushed:
+            while self._written < target:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._flushed.wait(remaining)
+        return True
+
+    def reopen_round(self, round_id):
+        """Lezárt kör újranyitása (pl. sikertelen lezárás után)"""
+        with self._lock:
+            self._closed_rounds.discard(round_id)
+
+    def stop(self):
+        """Leállítás előtt a maradék szavazatok kiírása"""
+        self._stopping = True
+        self._wake.set()
+        if self._writer_alive():
+            self._thread.join(FLUSH_TIMEOUT_SECONDS)
+        self._write_pending()
+        journal = self._own_journal()
+        if journal:
+            journal.close()
+        self._journal = None
+
+    def _ensure_journal(self):
+        """A folyamat saját naplójának megnyitása és visszajátszása (forkolt workerben újra)"""
+        if self._journal_opener is None or self._journal_pid == os.getpid():
+            return 0
+        with self._journal_lock:
+            if self._journal_pid == os.getpid():
+                return 0
+            with self._lock:
+                # A szülő folyamat naplóját nem zárjuk be: a fájlzár és a leképezés az övé
+                self._journal = None
+            journal = self._journal_opener()
+            replayed = journal.replay() if journal else []
+            with self._lock:
+                self._journal = journal
+                self._journal_pid = os.getpid()
+
+        if replayed:
+            self.restore(replayed)
+            if self._logger:
+                self._logger.warning('%d szavazat visszajátszva a naplóból (%s)', len(replayed), journal.path)
+        return len(replayed)
+
+    def _own_journal(self):
+        """A napló, ha ebben a folyamatban nyílt meg (a hívó zárja alatt)"""
+        return self._journal if self._journal_pid == os.getpid() else None
+
+    def _writer_alive(self):
+        return self._thread is not None and self._thread.is_alive() and self._thread_pid == os.getpid()
+
+    def _ensure_writer(self):
+        """Író szál indítása első szavazatkor (forkolt worker folyamatban újra)"""
+        if self._writer_alive() or self._stopping:
+            return
+        with self._lock:
+            if self._writer_alive():
+                return
+            if self._thread_pid != os.getpid():
+                # A szülő folyamat kapcsolata nem használható a gyermekben
+                self._connection = None
+            self._thread = threading.Thread(target=self._run, name='vote-writer', daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if not self._write_pending():
+                time.sleep(RETRY_DELAY_SECONDS)
+
+    def _write_pending(self):
+        """Egy köteg kiírása; átmeneti hibánál a szavazatok visszakerülnek a pufferbe
+
+        Ha a köteget egy-egy hibás sor (IntegrityError, pl. csapat nélküli
+        szavazat) buktatja el, soronként próbáljuk újra: a hibás sorok
+        naplózva kimaradnak, hogy ne tartsák vissza a kör többi szavazatát.
+        """
+        with self._write_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = {}
+                self._in_flight = batch
+                target = self._accepted
+
+            failed, error = {}, None
+            try:
+                if batch:
+                    self._write_batch(list(batch.values()))
+            except IntegrityError:
+                self._discard_connection()
+                failed, error = self._write_rows(batch)
+            except Exception as e:
+                self._discard_connection()
+                failed, error = batch, e
+
+            if failed:
+                with self._lock:
+                    # Az azóta érkezett újabb szavazatok maradnak érvényben
+                    for key, vote in failed.items():
+                        current = self._pending.get(key)
+                        if current is None or current.updated_at < vote.updated_at:
+                            self._pending[key] = vote
+                    self._in_flight = {}
+                if self._logger:
+                    self._logger.error('Szavazat köteg kiírása sikertelen (%d db): %s', len(failed), error)
+                return False
+
+            with self._flushed:
+                self._in_flight = {}
+                self._written = max(self._written, target)
+                journal = self._own_journal()
+                if journal and not self._pending:
+                    # Minden naplózott szavazat az adatbázisban van (vagy végleg eldobva)
+                    journal.reset()
+                self._flushed.notify_all()
+
+        if batch:
+            state_cache.bump({vote.game_id for vote in batch.values()}, changed_tables={'vote'})
+        return True
+
+    def _write_rows(self, batch):
+        """Soronkénti kiírás; (ki nem írt maradék, hiba) átmeneti hibánál"""
+        items = list(batch.items())
+        for index, (key, vote) in enumerate(items):
+            try:
+                self._write_batch([vote])
+            except IntegrityError as e:
+                self._discard_connection()
+                if self._logger:
+                    self._logger.warning('Szavazat eldobva (játékos %s, kör %s): %s', vote.player_id, vote.round_id, e)
+            except Exception as e:
+                self._discard_connection()
+                return dict(items[index:]), e
+        return {}, None
+
+    def _write_batch(self, votes):
+        from src.models.game import Round, Vote
+
+        connection = self._get_connection()
+
+        # Közben (pl. másik workerben) lezárt körbe nem írunk: az eredmény már elkészült.
+        # Ugyanabban a tranzakcióban olvassuk, így a lezárás és a kiírás nem csúszhat egymásba.
+        round_table = Round.__table__
+        open_rounds = set(connection.execute(select(round_table.c.id).where(
+            round_table.c.id.in_({vote.round_id for vote in votes}),
+            round_table.c.state == 'voting'
+        )).scalars())
+        late_votes = [vote for vote in votes if vote.round_id not in open_rounds]
+        if late_votes:
+            votes = [vote for vote in votes if vote.round_id in open_rounds]
+            if self._logger:
+                self._logger.warning('%d szavazat eldobva: a kör már lezárult', len(late_votes))
+            if not votes:
+                connection.commit()
+                return
+
+        table = Vote.__table__
+        statement = sqlite_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.player_id, table.c.round_id],
+            set_={
+                'number': statement.excluded.number,
+                'team_id': statement.excluded.team_id,
+                'updated_at': statement.excluded.updated_at
+            },
+            # Más worker folyamat frissebb szavazatát nem írjuk felül
+            where=or_(table.c.updated_at.is_(None), table.c.updated_at <= statement.excluded.updated_at)
+        )
+
+        connection.execute(statement, [{
+            'player_id': vote.player_id,
+            'team_id': vote.team_id,
+            'round_id': vote.round_id,
+            'number': vote.number,
+            'created_at': vote.updated_at,
+            'updated_at': vote.updated_at
+        } for vote in votes])
+        connection.commit()
+
+    def _get_connection(self):
+        """Saját, poolból leválasztott kapcsolat teljes fsync-kel a kötegekhez"""
+        if self._connection is None:
+            connection = self._engine.connect()
+            connection.detach()
+            connection.exec_driver_sql('PRAGMA synchronous=FULL')
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _discard_connection(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+vote_buffer = VoteBuffer()
+
+def init_vote_buffer(app, db):
+    """Író szál adatbázis kapcsolata (db.init_app után hívandó)"""
+    app.config.setdefault('VOTE_FLUSH_INTERVAL_MS', int(FLUSH_INTERVAL_SECONDS * 1000))
+    vote_buffer.flush_interval = app.config['VOTE_FLUSH_INTERVAL_MS'] / 1000
+
+    with app.app_context():
+        vote_buffer.configure(db.engine, app.logger)
+    atexit.register(vote_buffer.stop)
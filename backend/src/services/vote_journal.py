@@ -0,0 +1,167 @@
+"""
+Memóriába képzett, csak hozzáfűzős szavazat napló - folyamat leállás utáni visszajátszáshoz
+"""
+
+import mmap
+import os
+import struct
+import zlib
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # Windows: nincs fájlzár, egyetlen folyamat használja
+    fcntl = None
+
+from .generation_marker import marker_path_for
+from .vote_buffer import PendingVote
+
+MAGIC = b'WQVJ'
+VERSION = 1
+PREALLOCATED_BYTES = 1024 * 1024  # ~26 000 szavazat; betelésekor duplázódik
+MAX_SLOTS = 64  # worker folyamatonként egy naplófájl
+
+# Fejléc: azonosító, verzió, korszak (epoch); minden ürítés új korszakot kezd,
+# így a fájlban maradt régi rekordokat nem kell kinullázni
+HEADER = struct.Struct('<4sHxxI')
+HEADER_SIZE = 16
+# Rekord: sorszám, updated_at (µs), game_id, round_id, player_id, team_id, szám, korszak,
+# majd a rekord CRC32 ellenőrzőösszege (utolsóként írva, félbeszakadt írás felismerésére)
+RECORD_BODY = struct.Struct('<QqIIIIII')
+CHECKSUM = struct.Struct('<I')
+RECORD_SIZE = RECORD_BODY.size + CHECKSUM.size
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+class VoteJournal:
+    """Szavazat események bináris naplója egy előre lefoglalt, mmap-elt fájlban
+
+    A hozzáfűzés egy struct.pack_into a leképezett memóriába (mikroszekundumok,
+    rendszerhívás nélkül). A folyamat összeomlását túléli, mert a lapok az
+    operációs rendszernél vannak; áramszünet ellen a pufferelt kötegek
+    synchronous=FULL commitja véd. Ha minden szavazat bekerült az adatbázisba,
+    a napló kiürül (reset).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+        if fcntl:
+            try:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Másik élő worker naplója
+                self._file.close()
+                raise
+        if os.fstat(self._file.fileno()).st_size < PREALLOCATED_BYTES:
+            self._file.truncate(PREALLOCATED_BYTES)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._epoch = self._read_epoch()
+        self._offset = HEADER_SIZE
+        self._sequence = 0
+
+    def append(self, vote):
+        """Egy szavazat esemény hozzáfűzése (a hívó zárja alatt)"""
+        offset = self._offset
+        if offset + RECORD_SIZE > len(self._map):
+            self._grow()
+        self._sequence += 1
+        RECORD_BODY.pack_into(
+            self._map, offset, self._sequence, (vote.updated_at - EPOCH) // MICROSECOND,
+            vote.game_id, vote.round_id, vote.player_id, vote.team_id or 0, vote.number, self._epoch
+        )
+        checksum = zlib.crc32(self._map[offset:offset + RECORD_BODY.size])
+        CHECKSUM.pack_into(self._map, offset + RECORD_BODY.size, checksum)
+        self._offset = offset + RECORD_SIZE
+
+    def replay(self):
+        """A napló érvényes rekordjai (PendingVote) sorszám szerint
+
+        Az első sérült (félbeszakadt írású) vagy régi korszakú rekordnál megáll.
+        """
+        votes = []
+        offset = HEADER_SIZE
+        while offset + RECORD_SIZE <= len(self._map):
+            fields = RECORD_BODY.unpack_from(self._map, offset)
+            sequence, updated_at, game_id, round_id, player_id, team_id, number, epoch = fields
+            checksum, = CHECKSUM.unpack_from(self._map, offset + RECORD_BODY.size)
+            body = self._map[offset:offset + RECORD_BODY.size]
+            if sequence == 0 or epoch != self._epoch or zlib.crc32(body) != checksum:
+                break
+            votes.append(PendingVote(
+                game_id, round_id, player_id, team_id or None, number,
+                EPOCH + updated_at * MICROSECOND
+            ))
+            offset += RECORD_SIZE
+            self._sequence = sequence
+
+        self._offset = offset
+        return votes
+
+    def reset(self):
+        """Minden naplózott szavazat az adatbázisban van: új korszak, elölről írunk"""
+        if self._offset == HEADER_SIZE:
+            return
+        self._epoch += 1
+        HEADER.pack_into(self._map, 0, MAGIC, VERSION, self._epoch)
+        self._offset = HEADER_SIZE
+        self._sequence = 0
+
+    def sync(self):
+        """Lapok kiírása lemezre (msync) - leállításkor"""
+        self._map.flush()
+
+    def close(self):
+        self.sync()
+        self._map.close()
+        self._file.close()
+
+    def _read_epoch(self):
+        magic, version, epoch = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            # Új vagy ismeretlen fájl: tiszta kezdés
+            epoch = 1
+            self._map[:] = bytes(len(self._map))
+            HEADER.pack_into(self._map, 0, MAGIC, VERSION, epoch)
+        return epoch
+
+    def _grow(self):
+        size = len(self._map) * 2
+        self._map.flush()
+        self._map.close()
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+def open_journal(database_path):
+    """Az első szabad naplóhely megnyitása az adatbázis mellett (None memóriabeli adatbázisnál)
+
+    Több worker esetén mindegyik saját fájlt zárol; egy újrainduló worker
+    megkapja az elhalt worker helyét, és visszajátssza annak naplóját.
+    """
+    base_path = marker_path_for(database_path, 'votelog')
+    if not base_path:
+        return None
+
+    for slot in range(MAX_SLOTS if fcntl else 1):
+        try:
+            return VoteJournal(f'{base_path}.{slot}')
+        except BlockingIOError:
+            continue
+    return None
+
+def init_vote_journal(app, db):
+    """Napló megnyitása, visszajátszás a Vote táblába, majd bekötés a pufferbe
+
+    init_vote_buffer után hívandó. A visszajátszott szavazatok az író szál
+    upsertjén keresztül kerülnek be, így a frissebb adatbázis sort nem írják
+    felül; az élő LUN motor a következő lekérdezéskor már ezekből épül fel.
+    """
+    from .vote_buffer import vote_buffer
+
+    with app.app_context():
+        database_path = db.engine.url.database
+
+    # Ebben a folyamatban azonnal; a forkolt workerek saját helyet nyitnak első szavazatkor
+    if vote_buffer.attach_journal(lambda: open_journal(database_path)):
+        vote_buffer.flush()
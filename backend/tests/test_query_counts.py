@@ -0,0 +1,117 @@
+"""
+Lekérdezésszám regressziós teszt: a forró végpontok SQL utasításainak
+száma nem függhet a csapatok számától (csapatonkénti lazy load ellen)
+
+Futtatás a backend könyvtárból: python -m pytest -q tests
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+from src.models.user import db
+from src.routes.game import game_bp
+from src.routes.voting import voting_bp
+from src.services.active_game import active_games, init_active_game
+from src.services.db_profile import configure_db_profile, init_db_profile
+from src.services.metrics import init_metrics
+from src.services.name_allocator import init_name_allocator, name_allocator
+from src.services.settings_cache import init_settings_cache
+from src.services.state_cache import init_state_cache
+from src.services.team_counts import init_team_counts
+from src.services.vote_buffer import init_vote_buffer, vote_buffer
+
+TEAM_COUNTS = (4, 40)
+
+@pytest.fixture
+def app():
+    with tempfile.TemporaryDirectory() as directory:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory, 'test.db')}"
+        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        configure_db_profile(app)
+        db.init_app(app)
+        init_db_profile(app, db)
+        init_metrics(app, db)
+        init_state_cache(app, db)
+        init_active_game(app, db)
+        init_settings_cache(app, db)
+        init_name_allocator(app, db)
+        init_team_counts(app, db)
+        init_vote_buffer(app, db)
+        # Kör időzítő nélkül: a lezárást a teszt hívja
+        app.register_blueprint(game_bp, url_prefix='/api')
+        app.register_blueprint(voting_bp, url_prefix='/api')
+
+        with app.app_context():
+            from src.models.game import Player, Team, Game, Round, Vote, QuizQuestion
+            from src.models.supporter import SupporterToken, ModeratorAction
+            from src.models.game_settings import GameSettings
+            db.create_all()
+
+        yield app
+
+        vote_buffer.flush()
+        vote_buffer._discard_connection()
+        with app.app_context():
+            db.engine.dispose()
+
+class StatementCounter:
+    """A kérést kiszolgáló szál SQL utasításai (az író szál kötegei nélkül)"""
+
+    def __init__(self, engine):
+        self.count = 0
+        self._thread_id = threading.get_ident()
+        event.listen(engine, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self._thread_id:
+            self.count += 1
+
+def measure(app, client, method, url, **kwargs):
+    with app.app_context():
+        engine = db.engine
+    counter = StatementCounter(engine)
+    try:
+        response = getattr(client, method)(url, **kwargs)
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter._record)
+    assert response.status_code == 200, response.get_json()
+    return counter.count
+
+def play_round(app, team_count):
+    """Friss játék team_count kétfős csapattal; a mért végpontok utasításszámai"""
+    client = app.test_client()
+    client.post('/api/moderator/reset-game')
+    active_games.invalidate()
+    name_allocator.reset()
+
+    for index in range(team_count * 2):
+        assert client.post('/api/register', json={'name': f'Vendég {index}'}).status_code == 201
+    assert client.post('/api/game/start-pairing').status_code == 200
+    response = client.post('/api/moderator/auto-pair', json={'team_size': 2, 'seed': 1})
+    assert response.status_code == 201, response.get_json()
+
+    counts = {'start_playing': measure(app, client, 'post', '/api/game/start-playing')}
+    counts['state'] = measure(app, client, 'get', '/api/game/state')
+
+    # Mindkét méretnél egyértelmű nyertes (az első csapat egyedi 1-ese), így a lezárás ugyanazt az utat járja
+    for index, team in enumerate(response.get_json()['teams']):
+        for player_id in team['member_ids']:
+            vote = client.post('/api/vote/submit', json={'player_id': player_id, 'number': 1 if index == 0 else 2})
+            assert vote.status_code == 200, vote.get_json()
+    assert vote_buffer.flush()
+
+    counts['round_status'] = measure(app, client, 'get', '/api/vote/round-status')
+    counts['finalize'] = measure(app, client, 'post', '/api/vote/finalize')
+    return counts
+
+def test_query_counts_do_not_grow_with_team_count(app):
+    small, large = (play_round(app, team_count) for team_count in TEAM_COUNTS)
+    assert small == large